@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Compare sequential Gerrit queries done with a new client per query, as
+# the FTBFS feed used to do, against the shared pooled client returned by
+# review_utils.get_gerrit_client. A local fake Gerrit is used, with a
+# simulated connection setup latency or a real TLS handshake:
+#
+#   python benchmarks/bench_gerrit_client.py -n 200 --connect-latency 20
+#   python benchmarks/bench_gerrit_client.py -n 200 --tls
+
+import argparse
+import time
+
+from rdoutils import review_utils
+
+import fakes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark shared Gerrit '
+                                     'client against a client per query')
+    parser.add_argument('-n', '--queries', dest='queries', default=200,
+                        type=int, help='Number of sequential queries')
+    parser.add_argument('-l', '--connect-latency', dest='latency',
+                        default=20, type=float,
+                        help='Simulated connection setup latency, in '
+                             'milliseconds (default: %(default)s)')
+    parser.add_argument('--tls', dest='tls', action='store_true',
+                        default=False,
+                        help='Serve the fake Gerrit over TLS')
+    return parser.parse_args()
+
+
+def run_queries(url, queries, shared):
+    start = time.perf_counter()
+    for i in range(queries):
+        client = review_utils.get_gerrit_client(url, shared=shared)
+        review_utils.get_reviews_project(client, 'nova-distgit',
+                                         status='NEW', intopic='FTBFS')
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    changes = fakes.make_changes(50)
+    with fakes.FakeGerrit(changes=changes, connect_latency=args.latency / 1000,
+                          tls=args.tls) as gerrit:
+        results = []
+        for name, shared in (('client per query', False),
+                             ('shared client', True)):
+            gerrit.connections = 0
+            elapsed = run_queries(gerrit.url, args.queries, shared)
+            results.append(elapsed)
+            print("%-18s %8.1f ms total %6.2f ms/query %4d connections" %
+                  (name, elapsed * 1000, elapsed * 1000 / args.queries,
+                   gerrit.connections))
+    print("speedup: %.1fx" % (results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
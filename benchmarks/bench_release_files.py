@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Time releases_utils.get_new_releases_review on a fake review against a
+# local stand-in for opendev with an artificial latency per request, for
+# several sizes of the fetch thread pool:
+#
+#   python benchmarks/bench_release_files.py -d 32 -l 50 -w 1 2 4 8 16
+
+import argparse
+import time
+
+from rdoutils import http_cache
+from rdoutils import releases_utils
+
+import fakes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the concurrent '
+                                     'fetch of release files of a review')
+    parser.add_argument('-d', '--deliverables', dest='deliverables',
+                        default=32, type=int,
+                        help='Deliverables modified in the review')
+    parser.add_argument('-l', '--latency', dest='latency', default=50,
+                        type=float,
+                        help='Latency of each request, in milliseconds '
+                             '(default: %(default)s)')
+    parser.add_argument('-w', '--workers', dest='workers', nargs='+',
+                        type=int, default=[1, 2, 4, 8, 16],
+                        help='Sizes of the thread pool to compare')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Measure the downloads, not the cache
+    http_cache.disable()
+    review, files = fakes.make_release_review(args.deliverables)
+    with fakes.FakeOpendev(files=files,
+                           latency=args.latency / 1000) as opendev:
+        releases_utils.RELEASES_RAW_URL = opendev.releases_raw_url
+        baseline = None
+        expected = None
+        for workers in args.workers:
+            releases_utils.FETCH_WORKERS = workers
+            releases_utils._session = None
+            start = time.perf_counter()
+            new_releases = releases_utils.get_new_releases_review(review)
+            elapsed = time.perf_counter() - start
+            if expected is None:
+                expected = new_releases
+            elif new_releases != expected:
+                print("ERROR: results with %s workers differ" % workers)
+            baseline = baseline or elapsed
+            print("%3d workers %8.1f ms speedup %5.2fx (ideal %dx)" %
+                  (workers, elapsed * 1000, baseline / elapsed,
+                   min(workers, 2 * args.deliverables)))
+
+
+if __name__ == '__main__':
+    main()
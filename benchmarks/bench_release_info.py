@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# Compare the ways releases_utils.get_release_info can parse the
+# deliverables of a whole series: full YAML load, tail parse of the last
+# release only, and memo hits by blob id:
+#
+#   python benchmarks/bench_release_info.py -d 500 -H 200
+
+import argparse
+import os
+import tempfile
+import time
+
+from rdoutils import cache_utils
+from rdoutils import releases_utils
+from rdoutils import yaml_utils
+
+import fakes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark parsing of '
+                                     'deliverable files')
+    parser.add_argument('-d', '--deliverables', dest='deliverables',
+                        default=500, type=int,
+                        help='Number of deliverables in the series')
+    parser.add_argument('-H', '--history', dest='history', default=200,
+                        type=int,
+                        help='Number of releases in each deliverable')
+    return parser.parse_args()
+
+
+def full_parse(content):
+    deliverable = yaml_utils.load(content)
+    latest_release = deliverable['releases'][-1]
+    return {'name': deliverable['team'],
+            'version': latest_release['version'],
+            'repos': [p['repo'] for p in latest_release['projects']]}
+
+
+def bench(name, parse, contents, baseline=None):
+    start = time.perf_counter()
+    results = [parse(content) for content in contents]
+    elapsed = time.perf_counter() - start
+    speedup = " %8.1fx" % (baseline / elapsed) if baseline else ""
+    print("%-12s %9.1f ms%s" % (name, elapsed * 1000, speedup))
+    return elapsed, results
+
+
+def main():
+    args = parse_args()
+    contents = [fakes.make_deliverable("team-%s" % i,
+                                       "openstack/project-%s" % i,
+                                       ["%s.0.0" % v
+                                        for v in range(args.history)])
+                for i in range(args.deliverables)]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        releases_utils._release_memo.set(cache_utils.MemoStore(
+            'release-info', path=os.path.join(tmpdir, 'memo.sqlite')))
+        baseline, expected = bench('full parse', full_parse, contents)
+        _, results = bench('tail parse', lambda c: releases_utils
+                           .get_release_info(c, memo=False), contents,
+                           baseline)
+        assert results == expected
+        bench('memo miss', releases_utils.get_release_info, contents,
+              baseline)
+        # Drop the in-memory copy to measure hits from the database
+        releases_utils.get_release_memo().memory.clear()
+        _, results = bench('memo hit', releases_utils.get_release_info,
+                           contents, baseline)
+        assert results == expected
+        releases_utils.get_release_memo().close()
+
+
+if __name__ == '__main__':
+    main()
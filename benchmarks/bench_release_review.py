@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+#
+# Replay a synthetic release day through rdo_release_review.process_reviews
+# against local stand-ins only: a fake Gerrit with the openstack/releases
+# reviews, a fake opendev serving their deliverable files, a fake file
+# server for rdoinfo and the release tarballs, local bare distgit repos
+# and a stub rdopkg. Reviews are processed in dry-run mode, twice: the
+# cold run starts with empty caches and mirrors, the warm run reuses them.
+#
+#   python benchmarks/bench_release_review.py -r 20 -p 100 -j 4
+#   python benchmarks/bench_release_review.py --save-baseline base.json
+#   python benchmarks/bench_release_review.py --baseline base.json
+#
+# The end-to-end time and the time of each stage recorded in the event log
+# are reported. With --baseline, times slower than the baseline by more
+# than --threshold percent are flagged and the exit status is 1. The rpm
+# python bindings are required to parse the specs.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fakes
+
+SERIES = 'zed'
+
+SPEC_TEMPLATE = """Name:           python-%(project)s
+Version:        %(version)s
+Release:        1%%{?dist}
+Summary:        Fake package %(project)s
+License:        ASL 2.0
+URL:            https://opendev.org/openstack/%(project)s
+Source0:        %(tarballs)s%(project)s-%%{version}.tar.gz
+BuildArch:      noarch
+
+%%global sources_gpg_sign 0x22284f69d9eccdf3df7819791c711af193ff8e54
+
+%%description
+Fake package %(project)s
+
+%%files
+
+%%changelog
+"""
+
+RDOPKG_STUB = """#!%(python)s
+# Stand-in for rdopkg new-version: update Version and Release of the spec
+# and commit the change.
+import glob
+import re
+import subprocess
+import sys
+import time
+
+time.sleep(%(delay)s)
+args = sys.argv[1:]
+if args[:1] != ['new-version']:
+    sys.exit("unsupported rdopkg action %%s" %% args)
+version = None
+options = iter(args[1:])
+for arg in options:
+    if arg in ('-u', '-e'):
+        next(options)
+    elif not arg.startswith('-'):
+        version = arg
+spec = glob.glob('*.spec')[0]
+with open(spec) as f:
+    content = f.read()
+content = re.sub(r'(?m)^Version:.*$', 'Version:        %%s' %% version,
+                 content)
+content = re.sub(r'(?m)^Release:.*$', 'Release:        1%%{?dist}',
+                 content)
+with open(spec, 'w') as f:
+    f.write(content)
+subprocess.check_call(['git', 'commit', '-q', '-a', '-m',
+                       'Update to %%s' %% version])
+print("Package updated to version %%s" %% version)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark rdo_release_'
+                                     'review on a synthetic release day')
+    parser.add_argument('-r', '--reviews', dest='reviews', default=10,
+                        type=int, help='Number of openstack/releases reviews '
+                                       '(default: %(default)s)')
+    parser.add_argument('-p', '--packages', dest='packages', default=40,
+                        type=int, help='Number of packages released, spread '
+                                       'over the reviews (default: '
+                                       '%(default)s)')
+    parser.add_argument('-j', '--jobs', dest='jobs', default=4, type=int,
+                        help='Packages processed concurrently (default: '
+                             '%(default)s)')
+    parser.add_argument('-l', '--latency', dest='latency', default=20,
+                        type=float,
+                        help='Latency of each Gerrit and opendev request, in '
+                             'milliseconds (default: %(default)s)')
+    parser.add_argument('--rdopkg-delay', dest='rdopkg_delay', default=0.2,
+                        type=float,
+                        help='Time taken by each rdopkg new-version, in '
+                             'seconds (default: %(default)s)')
+    parser.add_argument('--late-tarballs', dest='late_tarballs', default=2,
+                        type=int,
+                        help='Packages whose tarball is published late '
+                             '(default: %(default)s)')
+    parser.add_argument('--tarball-delay', dest='tarball_delay', default=3,
+                        type=float,
+                        help='Delay of the late tarballs, in seconds '
+                             '(default: %(default)s)')
+    parser.add_argument('--baseline', dest='baseline', default=None,
+                        help='Results of a previous run to compare with')
+    parser.add_argument('--save-baseline', dest='save_baseline',
+                        default=None, help='Save the results in this file')
+    parser.add_argument('--threshold', dest='threshold', default=20,
+                        type=float,
+                        help='Slowdown over the baseline flagged as a '
+                             'regression, in percent (default: %(default)s)')
+    parser.add_argument('-k', '--keep', dest='keep', action='store_true',
+                        default=False,
+                        help='Keep the temporary directory of the run')
+    parser.add_argument('-v', '--verbose', dest='verbose',
+                        action='store_true', default=False,
+                        help='Show the log of rdo_release_review')
+    return parser.parse_args()
+
+
+def git(*args, **kwargs):
+    subprocess.check_call(['git'] + list(args), stdout=subprocess.DEVNULL,
+                          **kwargs)
+
+
+def make_distgits(root, packages, tarballs_url):
+    """ Create a bare distgit repo with a <series>-rdo branch per package
+    and a common upstream repo. Returns the path of the upstream repo.
+    """
+    work = os.path.join(root, 'work')
+    upstream = os.path.join(root, 'upstream.git')
+    git('init', '-q', work)
+    git('commit', '-q', '--allow-empty', '-m', 'Upstream', cwd=work)
+    git('clone', '-q', '--bare', work, upstream)
+    shutil.rmtree(work)
+    for project in packages:
+        name = 'python-%s' % project
+        work = os.path.join(root, 'work', name)
+        os.makedirs(work)
+        git('init', '-q', '-b', '%s-rdo' % SERIES, work)
+        with open(os.path.join(work, '%s.spec' % name), 'w') as f:
+            f.write(SPEC_TEMPLATE % {'project': project, 'version': '1.4.0',
+                                     'tarballs': tarballs_url})
+        git('add', '.', cwd=work)
+        git('commit', '-q', '-m', 'Initial spec', cwd=work)
+        git('clone', '-q', '--bare', work,
+            os.path.join(root, 'distgits', '%s.git' % name))
+    shutil.rmtree(os.path.join(root, 'work'))
+    return upstream
+
+
+def make_rdoinfo(root, packages, upstream):
+    packages_info = []
+    for project in packages:
+        name = 'python-%s' % project
+        packages_info.append({
+            'project': project,
+            'name': name,
+            'maintainers': ['dev@example.com'],
+            'upstream': upstream,
+            'distgit': os.path.join(root, 'distgits', '%s.git' % name),
+            'tags': {SERIES: None},
+        })
+    info = {'releases': [{'name': SERIES,
+                          'repos': [{'name': 'el9s',
+                                     'branch': '%s-rdo' % SERIES}]}],
+            'packages': packages_info}
+    # JSON is valid YAML
+    content = json.dumps(info, indent=1)
+    os.makedirs(os.path.join(root, 'home', 'rdoinfo'))
+    # the distgit store reads rdo-full.yml, as rdopkg clone does
+    for info_file in ('rdo.yml', 'rdo-full.yml'):
+        with open(os.path.join(root, 'home', 'rdoinfo', info_file),
+                  'w') as f:
+            f.write(content)
+    return content
+
+
+def make_reviews(count, packages):
+    """ Return the Gerrit changes and opendev files of count reviews
+    releasing packages deliverables in total.
+    """
+    changes = []
+    files = {}
+    per_review = max(packages // count, 1)
+    for i in range(count):
+        first = i * per_review
+        size = per_review if i < count - 1 else packages - first
+        if size <= 0:
+            break
+        review, review_files = fakes.make_release_review(
+            size, series=SERIES, number=i + 1, first=first)
+        review['project'] = 'openstack/releases'
+        review['submitted'] = '2026-10-18 10:%02d:00.000000000' % (i % 60)
+        changes.append(review)
+        files.update(review_files)
+    return changes, files
+
+
+def install_rdopkg_stub(root, delay):
+    bindir = os.path.join(root, 'bin')
+    os.makedirs(bindir)
+    stub = os.path.join(bindir, 'rdopkg')
+    with open(stub, 'w') as f:
+        f.write(RDOPKG_STUB % {'python': sys.executable, 'delay': delay})
+    os.chmod(stub, 0o755)
+    os.environ['PATH'] = bindir + os.pathsep + os.environ['PATH']
+
+
+def run(name, root, args, servers):
+    """ Process the reviews, return the end-to-end time, the stage summary
+    and the outcomes of the packages.
+    """
+    from rdorelease import events
+    from rdorelease import rdo_release_review
+    from rdoutils import tarball_poller
+
+    gerrit, opendev, files = servers
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        env = rdo_release_review.env_prep(os.path.join(root, 'rdo-release'),
+                                          'bench')
+    env.events = events.EventLog(os.path.join(root, '%s-events.jsonl' %
+                                              name))
+    # Check the tarballs often, the delays are short
+    env.tarballs.close()
+    env.tarballs = tarball_poller.TarballPoller(initial_wait=0.05,
+                                                max_wait=0.5, timeout=60)
+    run_args = argparse.Namespace(release=SERIES, days=1, number=None,
+                                  reprocess=True, changelog_user=None,
+                                  changelog_email=None, rdoinfo_tag=None,
+                                  dry_run=True, jobs=args.jobs)
+    files.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        rdo_release_review.process_reviews(env, run_args)
+    elapsed = time.perf_counter() - start
+    env.tarballs.close()
+    env.events.close()
+    outcomes = {}
+    with open(env.events.path) as f:
+        for line in f:
+            event = json.loads(line)
+            outcome = event.get('outcome')
+            if event.get('stage') == 'tarball-wait' and outcome == 'timeout':
+                outcome = 'tarball-timeout'
+            elif (event.get('stage') not in ('prepare', 'send') or
+                    outcome == 'ready'):
+                continue
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return elapsed, env.events.summary(), outcomes
+
+
+def compare(results, baseline, threshold):
+    """ Return the lines describing results slower than baseline """
+    regressions = []
+    limit = 1 + threshold / 100.0
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['total'] > base['total'] * limit:
+            regressions.append("%s end-to-end %.2fs, baseline %.2fs" %
+                               (name, result['total'], base['total']))
+        for stage, stats in result['stages'].items():
+            base_stats = base['stages'].get(stage)
+            # Ignore the noise of stages too fast to matter
+            if not base_stats or stats['p50'] < 0.05:
+                continue
+            if stats['p50'] > base_stats['p50'] * limit:
+                regressions.append("%s %s p50 %.3fs, baseline %.3fs" %
+                                   (name, stage, stats['p50'],
+                                    base_stats['p50']))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    root = tempfile.mkdtemp(prefix='bench-release-review-')
+    # rdoinfo, the caches and the distgit store live under root. HOME must
+    # be set before rdoutils.rdoinfo is imported.
+    os.environ['HOME'] = os.path.join(root, 'home')
+    os.environ['RDOUTILS_CACHE_DIR'] = os.path.join(root, 'cache')
+    for var in ('GIT_AUTHOR', 'GIT_COMMITTER'):
+        os.environ['%s_NAME' % var] = 'Bench'
+        os.environ['%s_EMAIL' % var] = 'bench@example.com'
+    try:
+        import rpm  # noqa: F401
+    except ImportError:
+        sys.exit("The rpm python bindings are required")
+    from rdorelease import events
+    from rdorelease import rdo_release_review
+    from rdoutils import releases_utils
+    from rdoutils import review_utils
+
+    projects = ['project-%s' % i for i in range(args.packages)]
+    changes, release_files = make_reviews(args.reviews, args.packages)
+    latency = args.latency / 1000
+    try:
+        with fakes.FakeGerrit(changes=changes, latency=latency) as gerrit, \
+                fakes.FakeOpendev(files=release_files,
+                                  latency=latency) as opendev, \
+                fakes.FakeFileServer() as files:
+            tarballs_url = files.url + 'tarballs/'
+            upstream = make_distgits(root, projects, tarballs_url)
+            files.files['/rdoinfo/rdo.yml'] = make_rdoinfo(root, projects,
+                                                           upstream)
+            for i, project in enumerate(projects):
+                path = '/tarballs/%s-1.5.0.tar.gz' % project
+                files.files[path] = 'tarball'
+                if i < args.late_tarballs:
+                    files.available[path] = args.tarball_delay
+            install_rdopkg_stub(root, args.rdopkg_delay)
+            review_utils.GERRIT_URLS['osp'] = gerrit.url
+            releases_utils.RELEASES_RAW_URL = opendev.releases_raw_url
+            rdo_release_review.rdoinfo_repo = files.url + 'rdoinfo/'
+            print("%s reviews, %s packages, %s jobs, %s late tarballs" %
+                  (len(changes), args.packages, args.jobs,
+                   args.late_tarballs))
+            results = {}
+            for name in ('cold', 'warm'):
+                elapsed, summary, outcomes = run(
+                    name, root, args, (gerrit, opendev, files))
+                results[name] = {'total': elapsed, 'stages': summary,
+                                 'outcomes': outcomes}
+                print("\n%s run: %.2fs, outcomes: %s" % (
+                    name, elapsed, ', '.join(
+                        "%s %s" % (outcome, count) for outcome, count
+                        in sorted(outcomes.items()))))
+                for line in events.format_summary(summary):
+                    print("  " + line)
+    finally:
+        if args.keep:
+            print("\nFiles kept in %s" % root)
+        else:
+            shutil.rmtree(root)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS (over %s%% slower than %s):" %
+                  (args.threshold, args.baseline))
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("\nNo regression over %s%% against %s" %
+              (args.threshold, args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# Compare the YAML loaders available to rdoutils on a full rdoinfo tree:
+#
+#   python benchmarks/bench_yaml_loaders.py ~/rdoinfo
+
+import argparse
+import os
+import sys
+import time
+
+import yaml
+from rdoutils import yaml_utils
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark YAML loaders on '
+                                     'the files of an rdoinfo checkout')
+    parser.add_argument('location', nargs='?',
+                        default=os.path.join(os.environ['HOME'], 'rdoinfo'),
+                        help='rdoinfo location')
+    parser.add_argument('-n', '--repeat', dest='repeat', default=3, type=int,
+                        help='Number of times each loader is run')
+    return parser.parse_args()
+
+
+def find_yaml_files(location):
+    yaml_files = []
+    for root, dirs, files in os.walk(location):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for f in files:
+            if f.endswith('.yml') or f.endswith('.yaml'):
+                yaml_files.append(os.path.join(root, f))
+    return sorted(yaml_files)
+
+
+def bench(load, contents, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in contents:
+            load(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    args = parse_args()
+    yaml_files = find_yaml_files(args.location)
+    if not yaml_files:
+        print("No yaml files found in %s" % args.location)
+        sys.exit(1)
+    contents = []
+    for yaml_file in yaml_files:
+        with open(yaml_file) as infile:
+            contents.append(infile.read())
+    size = sum(len(c) for c in contents)
+    print("%d files, %d KiB" % (len(contents), size // 1024))
+    loaders = [
+        ('ruamel round-trip', yaml_utils.load_rt),
+        ('PyYAML SafeLoader',
+         lambda c: yaml.load(c, Loader=yaml.SafeLoader)),
+        ('yaml_utils.load (%s)' % yaml_utils.SafeLoader.__name__,
+         yaml_utils.load),
+    ]
+    baseline = None
+    for name, load in loaders:
+        elapsed = bench(load, contents, args.repeat)
+        if baseline is None:
+            baseline = elapsed
+        print("%-30s %8.3fs  x%.1f" % (name, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
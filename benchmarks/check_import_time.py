@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+# Check the import time of every console_scripts entry point in setup.cfg
+# with python -X importtime. It fails if any of them imports one of the
+# heavy dependencies which must only be loaded when needed, or if importing
+# it takes longer than the budget:
+#
+#   python benchmarks/check_import_time.py --budget 150
+
+import argparse
+import configparser
+import os
+import subprocess
+import sys
+
+# Dependencies which must not be imported when loading a command
+HEAVY_MODULES = ['distroinfo', 'dnf', 'jenkins', 'koji', 'pandas',
+                 'pygerrit2', 'rdopkg', 'requests', 'rpm', 'ruamel', 'sh']
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check import time of '
+                                     'console_scripts entry points')
+    parser.add_argument('-b', '--budget', dest='budget', default=150,
+                        type=int,
+                        help='Maximum import time of a command, in '
+                             'milliseconds (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', dest='repeat', default=3,
+                        type=int,
+                        help='Number of measures per command, the best one '
+                             'is used (default: %(default)s)')
+    return parser.parse_args()
+
+
+def get_entry_points():
+    config = configparser.ConfigParser()
+    config.read(os.path.join(BASE_DIR, 'setup.cfg'))
+    entry_points = {}
+    for line in config['entry_points']['console_scripts'].splitlines():
+        if not line.strip():
+            continue
+        name, target = [s.strip() for s in line.split('=', 1)]
+        entry_points[name] = target.split(':')[0]
+    return entry_points
+
+
+def measure_import(module):
+    """ Return cumulative import time of module in ms and imported modules
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [BASE_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           'import %s' % module],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          env=env, universal_newlines=True, cwd=BASE_DIR)
+    if proc.returncode != 0:
+        raise RuntimeError("Failed to import %s:\n%s" %
+                           (module, proc.stderr))
+    cumulative = 0
+    imported = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = [f.strip() for f in line[len('import time:'):].split('|')]
+        if not fields[0].isdigit():
+            # header line
+            continue
+        name = fields[2].strip()
+        imported.append(name)
+        if name == module:
+            cumulative = int(fields[1])
+    return cumulative / 1000.0, imported
+
+
+def main():
+    args = parse_args()
+    failed = False
+    for name, module in sorted(get_entry_points().items()):
+        elapsed = None
+        for _ in range(args.repeat):
+            measure, imported = measure_import(module)
+            elapsed = measure if elapsed is None else min(elapsed, measure)
+        heavy = sorted(set(m.split('.')[0] for m in imported) &
+                       set(HEAVY_MODULES))
+        status = 'OK'
+        if heavy or elapsed > args.budget:
+            status = 'FAIL'
+            failed = True
+        print("%-4s %-22s %-45s %7.1fms %s" % (
+              status, name, module, elapsed,
+              'imports %s' % ', '.join(heavy) if heavy else ''))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
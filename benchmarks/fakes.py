@@ -0,0 +1,277 @@
+# Local fake services used by the benchmarks. They only implement the parts
+# of the APIs used by rdoutils.
+
+import json
+import os
+import re
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http import server
+from urllib import parse
+
+GERRIT_MAGIC_PREFIX = ")]}'\n"
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # Simulated cost of opening a connection (TCP and TLS handshakes
+        # to a remote host)
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+        self.server.connections += 1
+        # Avoid delayed ACK stalls on keep-alive connections
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server.BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, status=200, content_type='application/json',
+                  head=False):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def do_GET(self, head=False):
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = parse.urlsplit(self.path)
+        status, body, content_type = self.server.get(
+            parse.unquote(url.path), parse.parse_qs(url.query))
+        self.send_body(body, status=status, content_type=content_type,
+                       head=head)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+
+class FakeServer(server.ThreadingHTTPServer):
+    """ Base of the fake HTTP services, run in a thread while used as a
+    context manager.
+
+    connect_latency simulates the cost of opening a connection and latency
+    the response time of each request, in seconds. Subclasses implement
+    get(path, params) returning (status, body, content type).
+    """
+    daemon_threads = True
+
+    def __init__(self, connect_latency=0, latency=0, tls=False):
+        server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.connect_latency = connect_latency
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.scheme = 'http'
+        self.certdir = None
+        if tls:
+            self._setup_tls()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    def _setup_tls(self):
+        self.certdir = tempfile.mkdtemp(prefix='fake-server-')
+        cert = os.path.join(self.certdir, 'cert.pem')
+        key = os.path.join(self.certdir, 'key.pem')
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey',
+                               'rsa:2048', '-nodes', '-days', '1',
+                               '-subj', '/CN=127.0.0.1', '-keyout', key,
+                               '-out', cert], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.scheme = 'https'
+
+    @property
+    def url(self):
+        return "%s://127.0.0.1:%s/" % (self.scheme, self.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+        if self.certdir:
+            shutil.rmtree(self.certdir)
+
+    def get(self, path, params):
+        return 404, 'Not found', 'text/plain'
+
+
+class FakeGerrit(FakeServer):
+    """ Fake Gerrit REST API serving /changes/ and /projects/ queries.
+
+    changes is a list of change dicts. A query matches changes having all
+    its key:value terms as fields, and any of its project: terms. Terms with
+    other operators are ignored. projects is a dict of project name to info.
+    """
+
+    def __init__(self, changes=None, projects=None, **kwargs):
+        FakeServer.__init__(self, **kwargs)
+        self.changes = changes or []
+        self.projects = projects or {}
+
+    def get(self, path, params):
+        if path.startswith('/a/'):
+            path = path[2:]
+        if path == '/changes/':
+            data = self.query_changes(params)
+        elif path == '/projects/':
+            data = self.query_projects(params)
+        else:
+            return FakeServer.get(self, path, params)
+        return 200, GERRIT_MAGIC_PREFIX + json.dumps(data), 'application/json'
+
+    def match(self, change, query):
+        projects = []
+        for term in query.replace('(', ' ').replace(')', ' ').split(' '):
+            if ':' not in term:
+                continue
+            key, value = term.split(':', 1)
+            value = value.strip('"')
+            if key == 'project':
+                projects.append(value)
+            elif key in change and str(change[key]) != value:
+                return False
+        # project terms are OR-combined, values starting with ^ are regexes
+        if projects:
+            return any(re.match(p + '$', change['project'])
+                       if p.startswith('^') else p == change['project']
+                       for p in projects)
+        return True
+
+    def query_changes(self, params):
+        query = params.get('q', [''])[0]
+        limit = int(params.get('n', [500])[0])
+        start = int(params.get('S', [0])[0])
+        changes = [c for c in self.changes if self.match(c, query)]
+        page = [dict(c) for c in changes[start:start + limit]]
+        if page and start + limit < len(changes):
+            page[-1]['_more_changes'] = True
+        return page
+
+    def query_projects(self, params):
+        limit = int(params.get('n', [500])[0])
+        start = int(params.get('S', [0])[0])
+        names = sorted(self.projects)[start:start + limit]
+        return {name: self.projects[name] for name in names}
+
+
+class FakeOpendev(FakeServer):
+    """ Fake opendev serving raw files of openstack/releases at commits as
+    /openstack/releases/raw/commit/<commit>/<path>.
+
+    files is a dict of (commit, path) to file content.
+    """
+    RAW_PATH = re.compile(r'^/openstack/releases/raw/commit/([^/]+)/(.*)$')
+
+    def __init__(self, files=None, **kwargs):
+        FakeServer.__init__(self, **kwargs)
+        self.files = files or {}
+
+    @property
+    def releases_raw_url(self):
+        return self.url + "openstack/releases/raw/commit/%s/%s"
+
+    def get(self, path, params):
+        match = self.RAW_PATH.match(path)
+        if match and match.groups() in self.files:
+            return (200, self.files[match.groups()],
+                    'text/plain; charset=utf-8')
+        return FakeServer.get(self, path, params)
+
+
+class FakeFileServer(FakeServer):
+    """ Fake static file server, as tarballs.opendev.org or a raw rdoinfo.
+
+    files is a dict of path to content. available is an optional dict of
+    path to the number of seconds after start() the file is published.
+    """
+
+    def __init__(self, files=None, available=None, **kwargs):
+        FakeServer.__init__(self, **kwargs)
+        self.files = files or {}
+        self.available = available or {}
+        self.started = time.time()
+
+    def start(self):
+        """ Restart the publication delays of available """
+        self.started = time.time()
+
+    def get(self, path, params):
+        delay = self.available.get(path, 0)
+        if path in self.files and time.time() >= self.started + delay:
+            return 200, self.files[path], 'application/octet-stream'
+        return FakeServer.get(self, path, params)
+
+
+def make_changes(count, projects=('openstack/nova-distgit',),
+                 branches=('rpm-master',), status='NEW'):
+    """ Return count fake changes spread over projects and branches """
+    changes = []
+    for number in range(1, count + 1):
+        changes.append({
+            '_number': number,
+            'project': projects[number % len(projects)],
+            'branch': branches[number % len(branches)],
+            'status': status,
+            'subject': "Change %s" % number,
+        })
+    return changes
+
+
+def make_deliverable(team, repo, versions):
+    """ Return the content of a deliverable file releasing versions of
+    repo.
+    """
+    lines = ["team: %s" % team, "type: library", "releases:"]
+    for version in versions:
+        lines += ["  - version: %s" % version,
+                  "    projects:",
+                  "      - repo: %s" % repo,
+                  "        hash: %040x" % abs(hash((repo, version)))]
+    return "\n".join(lines) + "\n"
+
+
+def make_release_review(count, series='zed', number=1, history=5, first=0):
+    """ Return (review, files) for a fake openstack/releases review adding a
+    new release to count deliverables of series, numbered from first, with
+    files for FakeOpendev.
+    """
+    cur_rev = "%040x" % (number * 2 + 1)
+    parent_rev = "%040x" % (number * 2)
+    files = {}
+    review_files = {}
+    for i in range(first, first + count):
+        path = "deliverables/%s/project-%s.yaml" % (series, i)
+        repo = "openstack/project-%s" % i
+        versions = ["1.%s.0" % v for v in range(history)]
+        files[(parent_rev, path)] = make_deliverable("team-%s" % i, repo,
+                                                     versions)
+        files[(cur_rev, path)] = make_deliverable(
+            "team-%s" % i, repo, versions + ["1.%s.0" % history])
+        review_files[path] = {'lines_inserted': 4}
+    review = {
+        '_number': number,
+        'current_revision': cur_rev,
+        'revisions': {cur_rev: {
+            'commit': {'parents': [{'commit': parent_rev}]},
+            'files': review_files,
+        }},
+    }
+    return review, files
@@ -0,0 +1,59 @@
+import json
+import os
+
+from rdoutils import cache_utils
+
+
+class CheckpointStore(object):
+    """ Persistent record of the work done by rdo_release_review.
+
+    It keeps, in a JSON file, the openstack/releases reviews processed
+    with their revision and the outcome for each package, the submission
+    time up to which all the reviews of each release were processed, and
+    the outcome of the rdoinfo pins processed. Changes are only written by
+    save().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {'reviews': {}, 'last_submitted': {}, 'pins': {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data.update(json.load(f))
+
+    def save(self):
+        cache_utils.atomic_write(self.path, json.dumps(self.data, indent=2,
+                                                       sort_keys=True))
+
+    def is_review_processed(self, number, revision):
+        review = self.data['reviews'].get(str(number))
+        return review is not None and review['revision'] == revision
+
+    def add_review(self, number, revision, release, submitted, outcomes):
+        self.data['reviews'][str(number)] = {'revision': revision,
+                                             'release': release,
+                                             'submitted': submitted,
+                                             'packages': outcomes}
+
+    def get_last_submitted(self, release):
+        """ Return the submission time up to which all the reviews of
+        release were processed, in Gerrit format, or None.
+        """
+        return self.data['last_submitted'].get(release)
+
+    def set_last_submitted(self, release, submitted):
+        """ Record that all the reviews of release submitted up to
+        submitted were processed. The time is never moved back.
+        """
+        last = self.data['last_submitted'].get(release)
+        if last is None or submitted > last:
+            self.data['last_submitted'][release] = submitted
+
+    def _pin_key(self, name, version, tag):
+        return "%s/%s/%s" % (tag, name, version)
+
+    def get_pin_outcome(self, name, version, tag):
+        return self.data['pins'].get(self._pin_key(name, version, tag))
+
+    def add_pin(self, name, version, tag, outcome):
+        self.data['pins'][self._pin_key(name, version, tag)] = outcome
@@ -0,0 +1,129 @@
+import json
+import math
+import threading
+import time
+
+# Number of events and seconds kept in memory before writing them
+BUFFER_SIZE = 100
+FLUSH_INTERVAL = 10
+
+
+def percentile(values, percent):
+    """ Return the nearest-rank percentile of a list of numbers """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Span(object):
+    """ Timer of a stage of the pipeline, see EventLog.span """
+
+    def __init__(self, event_log, stage, fields):
+        self.event_log = event_log
+        self.stage = stage
+        self.fields = fields
+        self.outcome = None
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.outcome = 'error'
+            self.fields['error'] = exc_type.__name__
+        self.event_log.record(self.stage, time.time() - self.start,
+                              outcome=self.outcome or 'ok', **self.fields)
+        return False
+
+
+class EventLog(object):
+    """ Structured log of a run of the release automation, written as JSON
+    lines to path.
+
+    Each pipeline stage is timed with span() and recorded as an event with
+    its duration, outcome and fields as package or release:
+
+        with events.span('clone', package=name, release=release) as span:
+            ...
+            span.outcome = 'not-branched'
+
+    Events are buffered and written in batches. summary() returns the
+    percentiles of the duration of each stage recorded.
+    """
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.time()
+        self.durations = {}
+
+    def emit(self, event, **fields):
+        """ Record an event with its time and fields """
+        fields['event'] = event
+        fields['time'] = round(time.time(), 3)
+        line = json.dumps(fields, sort_keys=True)
+        with self.lock:
+            self.buffer.append(line)
+            if (len(self.buffer) >= self.buffer_size or
+                    time.time() - self.last_flush >= self.flush_interval):
+                self._flush()
+
+    def record(self, stage, duration, outcome='ok', **fields):
+        """ Record the duration in seconds of a stage """
+        with self.lock:
+            self.durations.setdefault(stage, []).append(duration)
+        self.emit('stage', stage=stage, duration=round(duration, 3),
+                  outcome=outcome, **fields)
+
+    def span(self, stage, **fields):
+        """ Return a context manager recording the duration of a stage """
+        return Span(self, stage, fields)
+
+    def _flush(self):
+        if self.buffer:
+            with open(self.path, 'a') as f:
+                f.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.last_flush = time.time()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def summary(self):
+        """ Return, by stage, the count, total, p50 and p95 of the durations
+        recorded.
+        """
+        with self.lock:
+            durations = {stage: list(values)
+                         for stage, values in self.durations.items()}
+        return {stage: {'count': len(values),
+                        'total': round(sum(values), 3),
+                        'p50': round(percentile(values, 50), 3),
+                        'p95': round(percentile(values, 95), 3)}
+                for stage, values in durations.items()}
+
+    def close(self):
+        """ Record the summary of the run and write all pending events """
+        self.emit('summary', stages=self.summary())
+        self.flush()
+
+
+def format_summary(summary):
+    """ Return the lines of a text table of an EventLog summary """
+    lines = ["%-20s %6s %10s %8s %8s" % ('stage', 'count', 'total', 'p50',
+                                         'p95')]
+    for stage, stats in sorted(summary.items(),
+                               key=lambda item: -item[1]['total']):
+        lines.append("%-20s %6s %9.1fs %7.2fs %7.2fs" % (
+            stage, stats['count'], stats['total'], stats['p50'],
+            stats['p95']))
+    return lines
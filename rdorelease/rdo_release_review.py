@@ -1,22 +1,27 @@
 import argparse
 import datetime
-import fileinput
+import functools
 import os
 import re
-import rpm
-import shutil
-import sys
+import threading
 import time
+from concurrent import futures
 
-from distroinfo import info
-from distroinfo import query
-from rdopkg.utils.git import git
+from rdoutils import cache_utils
+from rdoutils import distgit_store
+from rdoutils import http_cache
 from rdoutils import review_utils
 from rdoutils import releases_utils
+from rdoutils import spec_cache
+from rdoutils import tarball_poller
 from rdoutils import rdoinfo as rdoinfo_utils
 from rdoutils.rdoinfo import NotInRdoinfoRelease
-from sh import rdopkg, spectool
 
+# rpm, sh, rdopkg and distroinfo are imported only where needed to keep
+# the startup fast.
+
+from . import events
+from .checkpoint import CheckpointStore
 from .utils import log_message
 
 rdoinfo_repo = ('https://raw.githubusercontent.com/'
@@ -24,6 +29,10 @@ rdoinfo_repo = ('https://raw.githubusercontent.com/'
 # From https://releases.openstack.org/#cryptographic-signatures
 current_pubkey_fingerprint = "22284f69d9eccdf3df7819791c711af193ff8e54"
 
+# sh swaps its module object while imported, so a first import from several
+# threads at once fails
+_sh_lock = threading.Lock()
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Process information about \
@@ -50,6 +59,13 @@ def parse_args():
                         default=None,
                         help='Path to rdoinfo when creating new releases from'
                         'rdoinfo pin updates instead of releases reviews')
+    parser.add_argument('--rdoinfo-revisions', dest='rdoinfo_revisions',
+                        default=None,
+                        help='Git revision range in rdoinfo to look for new '
+                        'pins, as OLD..NEW, OLD...NEW or a single commit. '
+                        'Only the tags files modified in the range are '
+                        'parsed. By default the last commit is compared to '
+                        'its parent')
     parser.add_argument('-e', '--changelog-email', dest='changelog_email',
                         default=None,
                         help='Email address to use in changelog entry for'
@@ -62,62 +78,118 @@ def parse_args():
                         default=None,
                         help='Tag in rdoinfo associated with this release.'
                         'By default the release name')
+    parser.add_argument('--no-http-cache', dest='http_cache',
+                        action='store_false', default=True,
+                        help='Download all the release files instead of '
+                        'using the local HTTP cache')
+    parser.add_argument('--releases-repo', dest='releases_repo', nargs='?',
+                        const='', default=None,
+                        help='Read deliverable files from a local clone of '
+                        'openstack/releases in this path, created if needed, '
+                        'instead of downloading them. Without path, the clone '
+                        'is kept in the rdoutils cache directory')
+    parser.add_argument('--reprocess', dest='reprocess',
+                        action='store_true', default=False,
+                        help='Process again reviews and rdoinfo pins already '
+                        'processed in previous runs, and look for reviews in '
+                        'the whole --days window')
+    parser.add_argument('-j', '--jobs', dest='jobs', default=4, type=int,
+                        help='Number of packages processed concurrently. '
+                        'Versions of the same package are always processed '
+                        'in order (default: %(default)s)')
     return parser.parse_args()
 
 
-def create_dirs(directory):
-    log_message('INFO', "Running rdo_auto_release in %s directory" % directory,
-                logfile, stdout_only=True)
-    dir_list = [directory, datadir, logdir, repodir]
+class ReleaseEnv(object):
+    """ Directories, log file and Gerrit user used by a run """
+
+    def __init__(self, directory, user):
+        self.directory = directory
+        self.datadir = directory + '/data'
+        self.logdir = directory + '/logs/'
+        now = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        self.logfile = "%s%s-rdo-auto-release.log" % (self.logdir, now)
+        self.eventfile = "%s%s-rdo-auto-release-events.jsonl" % (
+            self.logdir, now)
+        self.repodir = self.datadir + '/distgits'
+        self.mirrordir = self.datadir + '/mirrors'
+        self.user = user
+        self.distgits = distgit_store.DistgitStore(self.mirrordir)
+        self.tarballs = tarball_poller.TarballPoller()
+        self.events = events.EventLog(self.eventfile)
+
+    def pkg_dir(self, package):
+        return os.path.join(self.repodir, package)
+
+    def spec_file(self, package):
+        return os.path.join(self.repodir, package, '%s.spec' % package)
+
+    def log(self, category, msg, stdout_only=False):
+        log_message(category, msg, self.logfile, stdout_only=stdout_only)
+
+
+def create_dirs(env):
+    env.log('INFO', "Running rdo_auto_release in %s directory" %
+            env.directory, stdout_only=True)
+    dir_list = [env.directory, env.datadir, env.logdir, env.repodir,
+                env.mirrordir]
     for directory in dir_list:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
 
 def env_prep(directory, gerrit_user):
-    global datadir
-    datadir = directory + '/data'
-    global logdir
-    logdir = directory + '/logs/'
-    global logfile
-    now = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    logfile = "%s%s-rdo-auto-release.log" % (logdir, now)
-    global repodir
-    repodir = datadir + '/distgits'
-    create_dirs(directory)
-    global session
-    global user
-    user = gerrit_user
+    env = ReleaseEnv(directory, gerrit_user)
+    create_dirs(env)
+    rdoinfo_utils.init_local_info()
     # We need to force TERM variables to invoke rdopkg methods
     # from library. In some cases as cron or jenkins it's not set
     # in environment
     os.environ["TERM"] = "linux"
     os.environ["TERMINFO"] = '/etc/terminfo'
+    return env
+
+
+def sh_command(name):
+    """ Return the sh command running program name """
+    with _sh_lock:
+        import sh
+    return sh.Command(name)
+
 
+def git(pkg_dir, *args, **kwargs):
+    """ Run git in pkg_dir """
+    from rdopkg.utils.git import git
 
-def new_pkgs_review(review, inforepo):
+    return git('-C', pkg_dir, *args, **kwargs)
+
+
+def git_ref_exists(pkg_dir, ref):
+    out = git(pkg_dir, 'show-ref', '--verify', '--quiet', ref, fatal=False,
+              log_cmd=False, log_fail=False)
+    return out.success
+
+
+def new_pkgs_review(env, review, index):
     review_number = review['_number']
-    log_message('INFO', "Processing releases for review %s" % review_number,
-                logfile)
+    env.log('INFO', "Processing releases for review %s" % review_number)
     new_pkgs = []
-    new_releases = releases_utils.get_new_releases_review(review)
+    with env.events.span('release-files', review=review_number):
+        new_releases = releases_utils.get_new_releases_review(review)
     for release in new_releases:
         for repo in release['repos']:
-            log_message('INFO', "%s Found new repo version %s %s" % (
-                        review_number, repo, release['version']), logfile)
-            pkg = query.find_package(inforepo, repo, strict=True)
+            env.log('INFO', "%s Found new repo version %s %s" % (
+                    review_number, repo, release['version']))
+            pkg = index.find(repo)
             if not pkg:
                 # Some openstack packages are special and name in RDO !=
                 # that repo name, i.e.: oslo.log vs oslo-log
                 repo_url = 'git://opendev.org/%s' % repo
                 repo_url_old = 'git://git.openstack.org/%s' % repo
-                pkg = \
-                    query.find_package(inforepo, repo_url, strict=True) or \
-                    query.find_package(inforepo, repo_url_old, strict=True)
+                pkg = index.find(repo_url) or index.find(repo_url_old)
             if pkg:
-                log_message('INFO', "%s Found new package %s %s" % (
-                            review_number, pkg['name'], release['version']),
-                            logfile)
+                env.log('INFO', "%s Found new package %s %s" % (
+                        review_number, pkg['name'], release['version']))
                 pkg = {'name': pkg['name'],
                        'version': release['version'],
                        'osp_release': release['release']}
@@ -125,31 +197,21 @@ def new_pkgs_review(review, inforepo):
     return new_pkgs
 
 
-def get_evr(package):
-    os.chdir("%s/%s" % (repodir, package))
-    tran = rpm.TransactionSet()
-    spec = tran.parseSpec('%s.spec' % package)
-    hdr = spec.packages[0].header
-    e = hdr.format('%{epoch}')
-    v = hdr.format('%{version}')
-    r = hdr.format('%{release}')
-    return (e, v, r)
+def get_spec_info(env, package):
+    return spec_cache.get_spec_info(env.pkg_dir(package), package)
+
+
+def get_evr(env, package):
+    return spec_cache.get_evr(get_spec_info(env, package))
 
 
-def clone_distgit(package, release):
-    os.chdir(repodir)
-    if os.path.exists(package):
-        shutil.rmtree(package)
-    rdopkg('clone', package, '-u', user)
-    os.chdir(package)
+def clone_distgit(env, package, release):
     stable_branch = "%s-rdo" % release
-    exist_remote = git.ref_exists('refs/remotes/origin/%s' % stable_branch)
-    if exist_remote:
-        git.create_branch(stable_branch, "origin/%s" % stable_branch)
-        git('checkout', stable_branch)
-    else:
-        raise NotBranchedPackage("Distgit for %s does not contain branch %s" %
-                                 (package, stable_branch))
+    try:
+        env.distgits.checkout(package, stable_branch, env.pkg_dir(package),
+                              user=env.user)
+    except distgit_store.BranchNotFound as e:
+        raise NotBranchedPackage(str(e))
 
 
 def is_string_in_file(file_name, string_to_search):
@@ -163,19 +225,18 @@ def is_string_in_file(file_name, string_to_search):
 
 def replace(file, current_line, new_line):
     """ Replace given line in the file by new line """
-    with fileinput.input(file, inplace=True) as f:
-        for line in f:
-            if current_line in line:
-                line = new_line
-            sys.stdout.write(line)
+    with open(file, 'r') as f:
+        lines = f.readlines()
+    lines = [new_line if current_line in line else line for line in lines]
+    cache_utils.atomic_write(file, ''.join(lines))
 
 
-def update_pubkey_fingerprint(package):
+def update_pubkey_fingerprint(env, package):
     """ Update pubkey fingerprint in .spec file
     This function aims to verify the pubkey fingerprint and update it if
     possible.
     """
-    spec_file = "{0}/{1}/{1}.spec".format(repodir, package)
+    spec_file = env.spec_file(package)
     current_line = "%global sources_gpg_sign 0x"
     wanted_line = "%global sources_gpg_sign 0x{}\n".format(
                   current_pubkey_fingerprint)
@@ -186,22 +247,27 @@ def update_pubkey_fingerprint(package):
         return False
 
 
-def new_version(package, version, release, dry_run=True,
+def new_version(env, package, version, release, dry_run=True,
                 chglog_user=None, chglog_email=None):
-    os.chdir("%s/%s" % (repodir, package))
+    rdopkg = sh_command('rdopkg')
+    pkg_dir = env.pkg_dir(package)
     stable_branch = "%s-rdo" % release
-    git('reset', '--hard', 'origin/%s' % stable_branch)
-    git('checkout', stable_branch)
+    git(pkg_dir, 'reset', '--hard', 'origin/%s' % stable_branch)
+    git(pkg_dir, 'checkout', stable_branch)
     cmd = ['new-version', '-b', '-U', version, '-t']
     if chglog_user:
         cmd = cmd + ['-u', chglog_user]
     if chglog_email:
         cmd = cmd + ['-e', chglog_email]
-    new_vers = rdopkg(*cmd, _err_to_out=True)
-    if update_pubkey_fingerprint(package):
-        git('commit', '-a', '--amend', '--no-edit')
+    with env.events.span('new-version', package=package, release=release,
+                         version=version):
+        new_vers = rdopkg(*cmd, _err_to_out=True, _cwd=pkg_dir)
+        if update_pubkey_fingerprint(env, package):
+            git(pkg_dir, 'commit', '-a', '--amend', '--no-edit')
     if not dry_run:
-        git('review', '-t', '%s-update' % release)
+        with env.events.span('git-review', package=package, release=release,
+                             version=version):
+            git(pkg_dir, 'review', '-t', '%s-update' % release)
     return str(new_vers)
 
 
@@ -211,144 +277,350 @@ def new_vers_stderr(msg):
 
 
 def is_newer(new_evr, old_evr):
+    import rpm
+
     comp = rpm.labelCompare(new_evr, old_evr)
     return comp == 1
 
 
-def tarball_exists(package):
-    os.chdir("%s/%s" % (repodir, package))
-    try:
-        spectool('-g', "%s.spec" % package)
-        return True
-    except Exception:
-        return False
+def get_source_url(env, package):
+    """ Return the url of Source0 in the spec of package """
+    return spec_cache.get_source_url(get_spec_info(env, package))
 
 
-def wait_for_tarball(package, retries=40, wait=30):
-    retry = 0
-    while retry < retries:
-        tarball_exist = tarball_exists(package)
-        if tarball_exist:
-            return True
-        else:
-            # Wait for sometime before retrying
-            time.sleep(wait)
-        retry += 1
-    return False
+def watch_tarball(env, package):
+    """ Return a future resolved to True as soon as the Source0 tarball of
+    package is published, or to False if it is still missing after the
+    poller timeout.
+    """
+    url = get_source_url(env, package)
+    if url is None or '://' not in url:
+        # Nothing to download
+        ready = futures.Future()
+        ready.set_result(True)
+        return ready
+    start = time.time()
+
+    def record(ready):
+        env.events.record('tarball-wait', time.time() - start,
+                          outcome='ready' if ready.result() else 'timeout',
+                          package=package, url=url)
+
+    ready = env.tarballs.watch(url)
+    ready.add_done_callback(record)
+    return ready
+
 
+def is_release_tag(env, package, version):
+    return git_ref_exists(env.pkg_dir(package), 'refs/tags/%s' % version)
 
-def is_release_tag(package, version):
-    os.chdir("%s/%s" % (repodir, package))
-    is_tag = git.ref_exists('refs/tags/%s' % version)
-    return is_tag
 
+def get_checkpoint(env):
+    return CheckpointStore(os.path.join(env.datadir, 'checkpoint.json'))
 
-def process_package(name, version, osp_release, dry_run, check_tag=False,
-                    check_tarball=False, chglog_user=None, chglog_email=None,
-                    rdoinfo_tag=None):
-    log_message('INFO', "Processing package %s version %s for release %s" %
-                (name, version, osp_release), logfile)
+
+def prepare_package(env, name, version, osp_release, **kwargs):
+    """ Check if a new version of a package must be proposed, preparing it
+    in its distgit checkout. Returns the outcome when it must not, one of
+    pinned, no-release-tag, not-newer, not-branched or not-in-release, or
+    None. kwargs are check_tag, chglog_user, chglog_email and rdoinfo_tag.
+    """
+    with env.events.span('prepare', package=name, release=osp_release,
+                         version=version) as span:
+        outcome = _prepare_package(env, name, version, osp_release, **kwargs)
+        span.outcome = outcome or 'ready'
+    return outcome
+
+
+def _prepare_package(env, name, version, osp_release, check_tag=False,
+                     chglog_user=None, chglog_email=None, rdoinfo_tag=None):
+    env.log('INFO', "Processing package %s version %s for release %s" %
+            (name, version, osp_release))
     if rdoinfo_tag is None:
         rdoinfo_tag = osp_release
     try:
         rdoinfo_pin = rdoinfo_utils.get_pin(name, rdoinfo_tag)
         if rdoinfo_pin and rdoinfo_pin != version:
-            log_message('INFO', "Package %s pinned to version %s in rdoinfo" %
-                        (name, rdoinfo_pin), logfile)
-            return
-        clone_distgit(name, osp_release)
-        if check_tag and not is_release_tag(name, version):
-            log_message('INFO', "Package %s has not release tag %s" %
-                        (name, version), logfile)
-            return
-        old_evr = get_evr(name)
-        new_vers = new_version(name, version, osp_release, dry_run=True,
+            env.log('INFO', "Package %s pinned to version %s in rdoinfo" %
+                    (name, rdoinfo_pin))
+            return 'pinned'
+        with env.events.span('clone', package=name, release=osp_release):
+            clone_distgit(env, name, osp_release)
+        if check_tag and not is_release_tag(env, name, version):
+            env.log('INFO', "Package %s has not release tag %s" %
+                    (name, version))
+            return 'no-release-tag'
+        old_evr = get_evr(env, name)
+        new_vers = new_version(env, name, version, osp_release, dry_run=True,
                                chglog_user=chglog_user,
                                chglog_email=chglog_email)
         if new_vers_stderr(new_vers):
-            log_message('INFO', new_vers_stderr(new_vers).group(1),
-                        logfile)
-        new_evr = get_evr(name)
+            env.log('INFO', new_vers_stderr(new_vers).group(1))
+        new_evr = get_evr(env, name)
         if not is_newer(new_evr, old_evr):
-            log_message('INFO', "Version %s is not newer that existing %s" %
-                        (new_evr, old_evr), logfile)
-            return
-        if check_tarball and not wait_for_tarball(name):
-            tag_exists = is_release_tag(name, version)
-            log_message('INFO', "Tarball for %s %s is not ready yet, "
-                        "Tag exists: %s" %
-                        (name, version, tag_exists), logfile)
-        log_message('INFO', "Sending review for package %s version %s" %
-                    (name, version), logfile)
-        new_version(name, version, osp_release, dry_run=dry_run,
-                    chglog_user=chglog_user, chglog_email=chglog_email)
-        if dry_run:
-            log_message('INFO', "Running in dry-run mode. Review is not sent",
-                        logfile)
+            env.log('INFO', "Version %s is not newer that existing %s" %
+                    (new_evr, old_evr))
+            return 'not-newer'
+        return None
     except NotBranchedPackage as e:
-        log_message('INFO', "Package %s %s for %s is not required: %s" %
-                    (name, version, osp_release, e), logfile)
+        env.log('INFO', "Package %s %s for %s is not required: %s" %
+                (name, version, osp_release, e))
+        return 'not-branched'
     except NotInRdoinfoRelease:
-        log_message('INFO', "Package %s is not in release %s" % (name,
-                    osp_release), logfile)
+        env.log('INFO', "Package %s is not in release %s" % (name,
+                osp_release))
+        return 'not-in-release'
     except Exception as e:
-        log_message('ERROR', "Package %s %s for %s failed to build: %s" %
-                    (name, version, osp_release, e), logfile)
+        env.log('ERROR', "Package %s %s for %s failed to build: %s" %
+                (name, version, osp_release, e))
         raise e
 
 
-def process_reviews(args):
+def send_package(env, name, version, osp_release, dry_run,
+                 tarball_ready=True, chglog_user=None, chglog_email=None):
+    """ Propose the new version of a package checked by prepare_package.
+    Returns the outcome, dry-run or review-sent.
+    """
+    with env.events.span('send', package=name, release=osp_release,
+                         version=version) as span:
+        try:
+            if not tarball_ready:
+                tag_exists = is_release_tag(env, name, version)
+                env.log('INFO', "Tarball for %s %s is not ready yet, "
+                        "Tag exists: %s" % (name, version, tag_exists))
+            env.log('INFO', "Sending review for package %s version %s" %
+                    (name, version))
+            new_version(env, name, version, osp_release, dry_run=dry_run,
+                        chglog_user=chglog_user, chglog_email=chglog_email)
+        except Exception as e:
+            env.log('ERROR', "Package %s %s for %s failed to build: %s" %
+                    (name, version, osp_release, e))
+            raise e
+        if dry_run:
+            env.log('INFO', "Running in dry-run mode. Review is not sent")
+            span.outcome = 'dry-run'
+        else:
+            span.outcome = 'review-sent'
+    return span.outcome
+
+
+def process_packages(env, jobs, dry_run, workers=1):
+    """ Propose new versions of packages. jobs is a list of (key, name,
+    version, osp_release, options), options being the keyword arguments
+    check_tag, check_tarball, chglog_user, chglog_email and rdoinfo_tag.
+    Each job is prepared, waits for its tarball to be published if
+    check_tarball, and is sent. Its outcome is one of pinned,
+    no-release-tag, not-newer, dry-run, review-sent, not-branched or
+    not-in-release.
+
+    Packages are processed concurrently by up to workers threads, each one
+    in its own distgit checkout, removed once all its jobs succeeded unless
+    in dry-run mode. Jobs for the same package are run in order, and the
+    jobs left for a package are skipped after one fails. Packages waiting
+    for their tarball do not hold a thread, they are resumed as soon as it
+    is published. Returns the outcome of each finished job by key and the
+    list of errors.
+    """
+    jobs_pkg = {}
+    for job in jobs:
+        jobs_pkg.setdefault(job[1], []).append(job)
+    outcomes = {}
+    errors = []
+    finished = threading.Semaphore(0)
+    executor = futures.ThreadPoolExecutor(max_workers=workers)
+
+    def run_jobs(pkg_jobs, tarball=None):
+        # tarball is the readiness future of the first job when it is
+        # resumed after waiting for its tarball
+        while pkg_jobs:
+            key, name, version, osp_release, options = pkg_jobs[0]
+            options = dict(options)
+            check_tarball = options.pop('check_tarball', False)
+            try:
+                outcome = None
+                if tarball is None:
+                    outcome = prepare_package(env, name, version,
+                                              osp_release, **options)
+                    if outcome is None and check_tarball:
+                        resume = functools.partial(executor.submit, run_jobs,
+                                                   pkg_jobs)
+                        watch_tarball(env, name).add_done_callback(resume)
+                        return
+                if outcome is None:
+                    outcome = send_package(
+                        env, name, version, osp_release, dry_run,
+                        tarball_ready=tarball is None or tarball.result(),
+                        chglog_user=options.get('chglog_user'),
+                        chglog_email=options.get('chglog_email'))
+                outcomes[key] = outcome
+            except Exception as e:
+                errors.append(e)
+                finished.release()
+                return
+            pkg_jobs = pkg_jobs[1:]
+            tarball = None
+        # Checkouts of failed packages are kept for inspection
+        if not dry_run:
+            try:
+                env.distgits.remove(env.pkg_dir(name))
+            except Exception as e:
+                errors.append(e)
+        finished.release()
+
+    for pkg_jobs in jobs_pkg.values():
+        executor.submit(run_jobs, pkg_jobs)
+    for _ in jobs_pkg:
+        finished.acquire()
+    executor.shutdown()
+    return outcomes, errors
+
+
+def get_last_finished(found):
+    """ Return the submission time of the latest of a list of reviews
+    found, as (submitted, finished), such that all the reviews submitted up
+    to it are finished, or None.
+    """
+    unfinished = [submitted for submitted, finished in found if not finished]
+    finished = [submitted for submitted, _ in found
+                if not unfinished or submitted < min(unfinished)]
+    return max(finished) if finished else None
+
+
+def process_reviews(env, args):
+    from distroinfo import info
+
     distroinfo = info.DistroInfo(
         info_files='rdo.yml',
         remote_info=rdoinfo_repo)
     inforepo = distroinfo.get_info()
+    index = rdoinfo_utils.RdoinfoIndex(inforepo['packages'])
+    checkpoint = get_checkpoint(env)
     if args.number:
         after_fmt = None
     else:
         after = datetime.datetime.now() - datetime.timedelta(days=args.days)
         after_fmt = after.strftime('%Y-%m-%d')
-    reviews = review_utils.get_osp_releases_reviews(args.release,
-                                                    after=after_fmt,
-                                                    number=args.number,
-                                                    status='merged')
+        last_submitted = checkpoint.get_last_submitted(args.release)
+        if not args.reprocess and last_submitted:
+            # Only look for reviews merged after the last one processed
+            after_fmt = max(after_fmt, last_submitted[:19])
+        after_fmt = '"%s"' % after_fmt.replace(' ', '+')
+    reviews = review_utils.iter_osp_releases_reviews(args.release,
+                                                     after=after_fmt,
+                                                     number=args.number,
+                                                     status='merged')
+    new_reviews = []
+    jobs = []
+    # submission time of the reviews found, and whether they are finished
+    found = []
     for review in reviews:
         rev_num = review['_number']
-        log_message('INFO', "Processing review %s" % rev_num, logfile)
-        new_pkgs = new_pkgs_review(review, inforepo)
-        for new_pkg in new_pkgs:
+        # Reviews explicitly requested with --review-number are always
+        # processed
+        if (not args.reprocess and not args.number and
+                checkpoint.is_review_processed(rev_num,
+                                               review['current_revision'])):
+            env.log('INFO', "Review %s already processed" % rev_num)
+            found.append((review['submitted'], True))
+            continue
+        env.log('INFO', "Processing review %s" % rev_num)
+        new_pkgs = new_pkgs_review(env, review, index)
+        review_keys = []
+        for i, new_pkg in enumerate(new_pkgs):
             if new_pkg['osp_release'] == args.release:
-                process_package(new_pkg['name'], new_pkg['version'],
-                                new_pkg['osp_release'], args.dry_run,
-                                check_tarball=True,
-                                chglog_user=args.changelog_user,
-                                chglog_email=args.changelog_email,
-                                rdoinfo_tag=args.rdoinfo_tag)
-
-
-def process_rdoinfo(args):
+                key = (rev_num, i)
+                options = {'check_tarball': True,
+                           'chglog_user': args.changelog_user,
+                           'chglog_email': args.changelog_email,
+                           'rdoinfo_tag': args.rdoinfo_tag}
+                jobs.append((key, new_pkg['name'], new_pkg['version'],
+                             new_pkg['osp_release'], options))
+                review_keys.append((key, new_pkg['name']))
+        new_reviews.append((review, review_keys))
+    outcomes, errors = process_packages(env, jobs, args.dry_run,
+                                        workers=args.jobs)
+    if not args.dry_run:
+        # Only reviews with all their packages processed are recorded
+        for review, review_keys in new_reviews:
+            finished = all(key in outcomes for key, name in review_keys)
+            found.append((review['submitted'], finished))
+            if finished:
+                checkpoint.add_review(review['_number'],
+                                      review['current_revision'],
+                                      args.release, review['submitted'],
+                                      {name: outcomes[key]
+                                       for key, name in review_keys})
+        if not args.number:
+            # The next runs look for reviews merged after the last one of
+            # the unbroken run of finished reviews, so the reviews not
+            # finished are queried again.
+            last_submitted = get_last_finished(found)
+            if last_submitted:
+                checkpoint.set_last_submitted(args.release, last_submitted)
+        checkpoint.save()
+    if errors:
+        raise errors[0]
+
+
+def process_rdoinfo(env, args):
     if args.rdoinfo_tag is None:
         rdoinfo_tag = args.release
     else:
         rdoinfo_tag = args.rdoinfo_tag
-    new_pins = rdoinfo_utils.get_new_pinned_builds(args.rdoinfo_pins,
-                                                   rdoinfo_tag)
-    for pin in new_pins:
-        log_message('INFO', "rdoinfo Found new package %s %s %s" % (
-                    pin['name'], pin['version'], pin['release']), logfile)
-        process_package(pin['name'], pin['version'], args.release,
-                        args.dry_run, check_tag=True,
-                        chglog_user=args.changelog_user,
-                        chglog_email=args.changelog_email,
-                        rdoinfo_tag=rdoinfo_tag)
+    checkpoint = get_checkpoint(env)
+    new_pins = rdoinfo_utils.get_new_pinned_builds(
+        args.rdoinfo_pins, rdoinfo_tag, revisions=args.rdoinfo_revisions)
+    jobs = []
+    for i, pin in enumerate(new_pins):
+        env.log('INFO', "rdoinfo Found new package %s %s %s" % (
+                pin['name'], pin['version'], pin['release']))
+        outcome = checkpoint.get_pin_outcome(pin['name'], pin['version'],
+                                             rdoinfo_tag)
+        if outcome and not args.reprocess:
+            env.log('INFO', "Package %s %s already processed: %s" % (
+                    pin['name'], pin['version'], outcome))
+            continue
+        options = {'check_tag': True,
+                   'chglog_user': args.changelog_user,
+                   'chglog_email': args.changelog_email,
+                   'rdoinfo_tag': rdoinfo_tag}
+        jobs.append((i, pin['name'], pin['version'], args.release, options))
+    outcomes, errors = process_packages(env, jobs, args.dry_run,
+                                        workers=args.jobs)
+    if not args.dry_run:
+        for i, outcome in outcomes.items():
+            pin = new_pins[i]
+            checkpoint.add_pin(pin['name'], pin['version'], rdoinfo_tag,
+                               outcome)
+        checkpoint.save()
+    if errors:
+        raise errors[0]
 
 
 def main():
     args = parse_args()
-    env_prep(args.directory, args.user)
-    if args.rdoinfo_pins:
-        process_rdoinfo(args)
-    else:
-        process_reviews(args)
+    if not args.http_cache:
+        http_cache.disable()
+    if args.releases_repo is not None:
+        releases_utils.use_releases_repo(args.releases_repo or None)
+    env = env_prep(args.directory, args.user)
+    try:
+        if args.rdoinfo_pins:
+            process_rdoinfo(env, args)
+        else:
+            process_reviews(env, args)
+    finally:
+        env.tarballs.close()
+        env.distgits.gc()
+        env.events.emit('http-cache', **http_cache.stats)
+        env.events.close()
+        env.log('INFO', "HTTP cache: %s" % http_cache.format_stats())
+        summary = env.events.summary()
+        if summary:
+            env.log('INFO', "Time spent by stage, events in %s" %
+                    env.eventfile)
+            for line in events.format_summary(summary):
+                env.log('INFO', line)
 
 
 class NotBranchedPackage(Exception):
@@ -1,5 +1,8 @@
-
 import datetime
+import threading
+
+# Messages are logged by several threads
+_log_lock = threading.Lock()
 
 
 def review_time_fmt(time):
@@ -10,7 +13,8 @@ def review_time_fmt(time):
 def log_message(category, msg, logfile, stdout_only=False):
     now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     log_msg = "%s - %s: %s" % (now, category, msg)
-    print(log_msg)
-    if not stdout_only:
-        f = open(logfile, 'a+')
-        f.write(log_msg + '\n')
+    with _log_lock:
+        print(log_msg)
+        if not stdout_only:
+            with open(logfile, 'a') as f:
+                f.write(log_msg + '\n')
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+def get_cache_path(*parts):
+    """ Return a path under the rdoutils cache, without creating anything.
+
+    The cache lives in $RDOUTILS_CACHE_DIR if set, otherwise in
+    $XDG_CACHE_HOME/rdoutils (~/.cache/rdoutils by default).
+    """
+    base_dir = os.environ.get('RDOUTILS_CACHE_DIR')
+    if not base_dir:
+        xdg_cache = os.environ.get('XDG_CACHE_HOME',
+                                   os.path.expanduser('~/.cache'))
+        base_dir = os.path.join(xdg_cache, 'rdoutils')
+    return os.path.join(base_dir, *parts)
+
+
+def get_cache_dir(*subdirs):
+    """ Return a directory under the rdoutils cache, creating it if needed """
+    cache_dir = get_cache_path(*subdirs)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    return cache_dir
+
+
+def get_db_path(name):
+    """ Return the path of the SQLite database name in the cache """
+    return get_cache_path('%s.sqlite' % name)
+
+
+def connect_db(path, schema, shared=False):
+    """ Open the SQLite database in path, creating its directory and the
+    tables and indexes of the schema script if needed. Rows are returned as
+    sqlite3.Row.
+
+    With shared, the connection can be used by several threads, which must
+    serialize their accesses.
+    """
+    db_dir = os.path.dirname(path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir, exist_ok=True)
+    db = sqlite3.connect(path, timeout=60, check_same_thread=not shared)
+    db.row_factory = sqlite3.Row
+    db.executescript(schema)
+    return db
+
+
+def atomic_write(path, content):
+    """ Write content (str or bytes) to path atomically.
+
+    Content is written to a temporary file in the same directory which is
+    then renamed over path, so readers never see a partially written file.
+    """
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    try:
+        perms = os.stat(path).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        perms = 0o666 & ~umask
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.%s.' % os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode) as tmp_file:
+            tmp_file.write(content)
+        os.chmod(tmp_path, perms)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+MEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MemoStore(object):
+    """ Persistent memo of JSON serializable values indexed by a string
+    key, usually a content hash, stored in SQLite in the rdoutils cache.
+
+    Values are also kept in memory, it can be shared by several threads.
+    """
+
+    def __init__(self, name, path=None):
+        self.path = path or get_db_path(name)
+        self.lock = threading.Lock()
+        self.memory = {}
+        self.db = connect_db(self.path, MEMO_SCHEMA, shared=True)
+        # A lost write only costs a new computation
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=OFF")
+
+    def get(self, key, default=None):
+        """ Return the value stored for key, a new copy on every call """
+        with self.lock:
+            value = self.memory.get(key)
+            if value is None:
+                row = self.db.execute("SELECT value FROM memo WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is None:
+                    return default
+                value = self.memory[key] = row[0]
+        return json.loads(value)
+
+    def set(self, key, value):
+        value = json.dumps(value)
+        with self.lock, self.db:
+            self.memory[key] = value
+            self.db.execute("INSERT OR REPLACE INTO memo VALUES (?, ?)",
+                            (key, value))
+
+    def close(self):
+        self.db.close()
+
+
+class Shared(object):
+    """ Object built by factory on first use and shared by all the threads
+    of the process. Usage example:
+
+        _memo = Shared(lambda: MemoStore('release-info'))
+        _memo.get().get(key)
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.instance = None
+
+    def get(self):
+        with self.lock:
+            if self.instance is None:
+                self.instance = self.factory()
+        return self.instance
+
+    def set(self, instance):
+        """ Replace the shared object, as a store in another path """
+        with self.lock:
+            self.instance = instance
@@ -0,0 +1,165 @@
+from rdoutils import cache_utils
+from rdoutils import cbs_utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    name TEXT PRIMARY KEY,
+    last_event INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tagged (
+    tag TEXT NOT NULL,
+    build_id INTEGER NOT NULL,
+    create_event INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    nvr TEXT NOT NULL,
+    epoch INTEGER,
+    version TEXT NOT NULL,
+    release TEXT NOT NULL,
+    PRIMARY KEY (tag, build_id, create_event)
+);
+CREATE INDEX IF NOT EXISTS tagged_tag_name ON tagged (tag, name);
+"""
+
+BUILD_FIELDS = ['tag', 'build_id', 'create_event', 'name', 'nvr', 'epoch',
+                'version', 'release']
+
+
+def get_default_mirror_path():
+    return cache_utils.get_db_path('cbs-tags')
+
+
+class CBSTagMirror(object):
+    """ Local SQLite mirror of the builds tagged in CBS Koji tags.
+
+    The first sync of a tag lists its builds at the current Koji event.
+    Later syncs fetch the tag_listing history of each tag after its last
+    event mirrored, in a single multicall request. As koji listTagged by
+    default, tag inheritance is not followed. Usage example:
+
+        mirror = CBSTagMirror()
+        mirror.sync(['cloud9s-openstack-zed-release',
+                     'cloud9s-openstack-zed-testing'])
+        mirror.latest_build('cloud9s-openstack-zed-release',
+                            'python-oslo-log')
+    """
+
+    def __init__(self, path=None, client=None):
+        self.path = path or get_default_mirror_path()
+        self._client = client
+        self.db = cache_utils.connect_db(self.path, SCHEMA)
+        # tags already synced by this process
+        self.synced = set()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = cbs_utils.get_cbs_client()
+        return self._client
+
+    def close(self):
+        self.db.close()
+
+    def get_last_events(self):
+        rows = self.db.execute("SELECT name, last_event FROM tags")
+        return {row['name']: row['last_event'] for row in rows}
+
+    def sync(self, tags, force=False):
+        """ Update the mirror of tags from Koji.
+
+        Tags already synced by this process are skipped unless force is
+        True.
+        """
+        tags = [t for t in tags if force or t not in self.synced]
+        if not tags:
+            return
+        event = self.client.getLastEvent()['id']
+        last_events = self.get_last_events()
+        known = [t for t in tags if t in last_events]
+        new = [t for t in tags if t not in last_events]
+        # list all the new tags in a single multicall
+        listings = cbs_utils.multicall([('listTagged', [tag], {'event': event})
+                                        for tag in new], client=self.client)
+        with self.db:
+            for tag, builds in zip(new, listings):
+                self._full_sync(tag, builds, event)
+            if known:
+                self._delta_sync(known, last_events, event)
+        self.synced.update(tags)
+
+    def _full_sync(self, tag, builds, event):
+        self.db.execute("DELETE FROM tagged WHERE tag = ?", (tag,))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO tagged VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(tag, b['build_id'], b['create_event'], b['package_name'],
+              b['nvr'], b.get('epoch'), b['version'], b['release'])
+             for b in builds])
+        self.db.execute("INSERT OR REPLACE INTO tags VALUES (?, ?)",
+                        (tag, event))
+
+    def _delta_sync(self, tags, last_events, event):
+        # only the history of each tag since its last sync is queried
+        tags = [t for t in tags if last_events[t] < event]
+        histories = cbs_utils.multicall(
+            [('queryHistory', [], {'tables': ['tag_listing'], 'tag': tag,
+                                   'afterEvent': last_events[tag],
+                                   'beforeEvent': event + 1})
+             for tag in tags], client=self.client)
+        for tag, history in zip(tags, histories):
+            last_event = last_events[tag]
+            for entry in history.get('tag_listing', []):
+                # changes after event are applied by the next sync
+                if last_event < entry['create_event'] <= event:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO tagged "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (tag, entry['build_id'], entry['create_event'],
+                         entry['name'],
+                         "%(name)s-%(version)s-%(release)s" % entry,
+                         entry.get('epoch'), entry['version'],
+                         entry['release']))
+                revoke_event = entry.get('revoke_event')
+                if revoke_event and last_event < revoke_event <= event:
+                    self.db.execute(
+                        "DELETE FROM tagged WHERE tag = ? AND build_id = ? "
+                        "AND create_event = ?",
+                        (tag, entry['build_id'], entry['create_event']))
+        self.db.executemany("UPDATE tags SET last_event = ? WHERE name = ?",
+                            [(event, t) for t in tags])
+
+    def _to_build(self, row):
+        build = {f: row[f] for f in BUILD_FIELDS}
+        # same keys as koji listTagged
+        build['package_name'] = build['name']
+        build['tag_name'] = build.pop('tag')
+        return build
+
+    def list_tagged(self, tag, latest=False, package=None):
+        """ Return the builds in tag, as returned by koji listTagged.
+
+        With latest, only the last build tagged for each package is
+        returned.
+        """
+        query = "SELECT * FROM tagged WHERE tag = ?"
+        params = [tag]
+        if package:
+            query += " AND name = ?"
+            params.append(package)
+        if latest:
+            query += (" AND create_event = (SELECT MAX(create_event) "
+                      "FROM tagged t WHERE t.tag = tagged.tag "
+                      "AND t.name = tagged.name)")
+        query += " ORDER BY name, create_event DESC"
+        return [self._to_build(row) for row in
+                self.db.execute(query, params)]
+
+    def latest_build(self, tag, package):
+        """ Return the latest build of package in tag, or None """
+        builds = self.list_tagged(tag, latest=True, package=package)
+        if builds:
+            return builds[0]
+        return None
+
+    def list_pkg_names(self, tag):
+        rows = self.db.execute("SELECT DISTINCT name FROM tagged "
+                               "WHERE tag = ? ORDER BY name", (tag,))
+        return [row['name'] for row in rows]
@@ -1,14 +1,81 @@
-import koji
+import threading
 
 # From https://cbs.centos.org/koji/api
 CBS_KOJI_URL = "https://cbs.centos.org/kojihub"
 
+# koji sessions are not thread-safe, each thread has its own
+_local = threading.local()
+
 
 def get_cbs_client():
-    return koji.ClientSession(CBS_KOJI_URL)
+    """ Return the CBS koji session of the current thread, created on first
+    use and shared by all the callers in this thread. Sessions must not be
+    passed to other threads.
+    """
+    client = getattr(_local, 'client', None)
+    if client is None:
+        import koji
+
+        client = _local.client = koji.ClientSession(CBS_KOJI_URL)
+    return client
+
+
+def multicall(calls, client=None):
+    """ Run calls in a single koji multiCall request.
+
+    calls is a list of (method, args, kwargs) tuples. The results are
+    returned in the same order, an exception is raised if any call fails.
+
+        multicall([('listTagged', ['cloud9s-openstack-zed-release'], {}),
+                   ('getBuild', ['python-oslo-log-5.0.1-1.el9s'], {})])
+    """
+    if not calls:
+        return []
+    client = client or get_cbs_client()
+    with client.multicall(strict=True) as m:
+        pending = [getattr(m, method)(*args, **kwargs)
+                   for method, args, kwargs in calls]
+    return [call.result for call in pending]
+
+
+def list_tagged(tags, latest=False, client=None):
+    """ Return the builds tagged in each of tags, indexed by tag, with a
+    single request.
+    """
+    results = multicall([('listTagged', [tag], {'latest': latest})
+                         for tag in tags], client=client)
+    return dict(zip(tags, results))
+
+
+def latest_builds(tags, packages, client=None):
+    """ Return the latest build of each package in each tag with a single
+    request, indexed by (tag, package). Value is None if the package is not
+    tagged.
+    """
+    keys = [(tag, package) for tag in tags for package in packages]
+    results = multicall([('getLatestBuilds', [tag], {'package': package})
+                         for tag, package in keys], client=client)
+    return {key: builds[0] if builds else None
+            for key, builds in zip(keys, results)}
+
+
+def get_builds(nvrs, client=None):
+    """ Return build info for each of nvrs with a single request, indexed
+    by nvr.
+    """
+    results = multicall([('getBuild', [nvr], {}) for nvr in nvrs],
+                        client=client)
+    return dict(zip(nvrs, results))
 
 
-def list_pkg_names_tagged_in(koji_tag):
+def list_pkg_names_tagged_in(koji_tag, mirror=None):
+    """ Return names of the packages tagged in koji_tag. If mirror, a
+    cbs_mirror.CBSTagMirror, is passed it's used instead of listing the tag
+    in CBS.
+    """
+    if mirror is not None:
+        mirror.sync([koji_tag])
+        return mirror.list_pkg_names(koji_tag)
     client = get_cbs_client()
     tagged_pkgs = client.listTagged(koji_tag)
 
@@ -1,6 +1,5 @@
 
 import argparse
-import jenkins
 import sys
 
 from rdoutils import jenkins_utils
@@ -29,6 +28,8 @@ def parse_args():
 
 def main():
     args = parse_args()
+    import jenkins
+
     server = jenkins_utils.get_jenkins_client(args.url, args.user,
                                               args.password)
     if args.token_file:
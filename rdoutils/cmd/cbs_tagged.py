@@ -0,0 +1,40 @@
+import argparse
+
+from rdoutils import cbs_mirror
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='List builds tagged in CBS '
+                                     'tags from a local mirror, synced '
+                                     'incrementally from CBS')
+    parser.add_argument('tags', nargs='+', metavar='TAG',
+                        help='CBS tag to list')
+    parser.add_argument('-l', '--latest', dest='latest', action='store_true',
+                        default=False,
+                        help='List only the latest build of each package')
+    parser.add_argument('-p', '--package', dest='package', default=None,
+                        help='List only builds of this package')
+    parser.add_argument('-m', '--mirror', dest='mirror', default=None,
+                        help='Path to the mirror database (default: %s)' %
+                             cbs_mirror.get_default_mirror_path())
+    parser.add_argument('--no-sync', dest='sync', action='store_false',
+                        default=True,
+                        help='Do not sync known tags from CBS before '
+                             'listing them')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    mirror = cbs_mirror.CBSTagMirror(path=args.mirror)
+    if args.sync:
+        mirror.sync(args.tags)
+    else:
+        # tags never mirrored must be synced anyway
+        known = mirror.get_last_events()
+        mirror.sync([t for t in args.tags if t not in known])
+    for tag in args.tags:
+        for build in mirror.list_tagged(tag, latest=args.latest,
+                                        package=args.package):
+            print("%s %s" % (build['nvr'], tag))
+    mirror.close()
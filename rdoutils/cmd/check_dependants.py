@@ -17,8 +17,6 @@ import argparse
 import os
 import sys
 
-import dnf
-
 
 def get_repos(release):
     RDO_TRUNK_C8 = {
@@ -68,6 +66,8 @@ def eprint(*args, **kwargs):
 def setup_dnf(release="wallaby"):
     """ Setup dnf query with two repos
     """
+    import dnf
+
     repos = get_repos(release)
     base = dnf.Base()
     # use digest to make repo id unique for each URL
@@ -0,0 +1,43 @@
+import argparse
+
+from rdoutils import deliverables
+from rdoutils import releases_repo
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='List deliverables of an '
+                                     'OpenStack series from a local catalog '
+                                     'of openstack/releases')
+    parser.add_argument('series', metavar='SERIES',
+                        help='OpenStack series, as zed')
+    parser.add_argument('-s', '--stable-branch', dest='stable_branch',
+                        action='store_true', default=None,
+                        help='List only deliverables with a stable branch')
+    parser.add_argument('-n', '--no-stable-branch', dest='stable_branch',
+                        action='store_false',
+                        help='List only deliverables without stable branch')
+    parser.add_argument('-r', '--releases-repo', dest='releases_repo',
+                        default=None,
+                        help='Path to the openstack/releases clone '
+                             '(default: %s)' %
+                             releases_repo.get_default_repo_path())
+    parser.add_argument('--no-update', dest='update', action='store_false',
+                        default=True,
+                        help='Do not fetch openstack/releases and update '
+                             'the catalog before listing')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    repo = releases_repo.ReleasesRepo(args.releases_repo)
+    catalog = deliverables.DeliverablesCatalog(repo=repo)
+    if args.update or not catalog.get_indexed_commit():
+        catalog.update()
+    for deliverable in catalog.list_deliverables(
+            args.series, stable_branch=args.stable_branch):
+        print("%s %s %s %s" % (deliverable['name'], deliverable['version'],
+                               deliverable['team'],
+                               ','.join(deliverable['repos'])))
+    catalog.close()
+    repo.close()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+
+from rdoutils import distgit_store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check out distgits of RDO '
+                                     'packages from a store of local '
+                                     'mirrors updated incrementally')
+    parser.add_argument('-s', '--store', dest='store', default=None,
+                        help='Directory of the mirrors (default: %s)' %
+                             distgit_store.get_default_store_path())
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+    checkout = subparsers.add_parser('checkout', help='Check out a branch of '
+                                     'the distgit of a package, replacing the '
+                                     'destination directory')
+    checkout.add_argument('package', metavar='PACKAGE', help='Package name')
+    checkout.add_argument('branch', metavar='BRANCH',
+                          help='Distgit branch, as zed-rdo')
+    checkout.add_argument('dest', metavar='DEST', nargs='?', default=None,
+                          help='Destination directory (default: ./PACKAGE)')
+    checkout.add_argument('-u', '--review-user', dest='user',
+                          default=os.environ.get('USERNAME',
+                                                 os.environ.get('USER')),
+                          help='Gerrit user of the review remotes')
+    checkout.add_argument('--no-fetch', dest='fetch', action='store_false',
+                          default=True,
+                          help='Do not update the mirror before checkout')
+    remove = subparsers.add_parser('remove', help='Remove a checkout')
+    remove.add_argument('dest', metavar='DEST', help='Checkout directory')
+    gc = subparsers.add_parser('gc', help='Clean up the mirrors and remove '
+                               'the least recently used ones when the store '
+                               'is too large')
+    gc.add_argument('-m', '--max-size', dest='max_size', default=None,
+                    type=int,
+                    help='Maximum size of the store in MiB (default: %s)' %
+                         (distgit_store.get_max_size() // (1024 * 1024)))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = distgit_store.DistgitStore(args.store)
+    if args.action == 'checkout':
+        try:
+            store.checkout(args.package, args.branch,
+                           args.dest or args.package, user=args.user,
+                           fetch=args.fetch)
+        except (distgit_store.BranchNotFound,
+                distgit_store.CheckoutFailed) as e:
+            print("ERROR: %s" % e)
+            sys.exit(1)
+    elif args.action == 'remove':
+        store.remove(args.dest)
+    elif args.action == 'gc':
+        max_size = None
+        if args.max_size is not None:
+            max_size = args.max_size * 1024 * 1024
+        for package in store.gc(max_size=max_size):
+            print("Removed mirror of %s" % package)
+        print("Store size: %s MiB" % (store.size() // (1024 * 1024)))
@@ -1,6 +1,5 @@
 
 import argparse
-import jenkins
 from rdoutils import jenkins_utils
 
 
@@ -23,6 +22,8 @@ def parse_args():
 
 def main():
     args = parse_args()
+    import jenkins
+
     server = jenkins_utils.get_jenkins_client(args.url)
     try:
         job = jenkins_utils.get_build_info(server, args.job_name, args.number)
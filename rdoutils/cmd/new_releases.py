@@ -1,8 +1,9 @@
 
 import argparse
 import datetime
-from distroinfo import info
-from distroinfo import query
+import sys
+from rdoutils import http_cache
+from rdoutils import rdoinfo
 from rdoutils import review_utils
 from rdoutils import releases_utils
 
@@ -21,6 +22,17 @@ def parse_args():
                         help='Number of days to list new releases')
     parser.add_argument('-n', '--review-number', dest='number', default=None,
                         help='Review number')
+    parser.add_argument('--releases-repo', dest='releases_repo', nargs='?',
+                        const='', default=None,
+                        help='Read deliverable files from a local clone of '
+                             'openstack/releases in this path, created if '
+                             'needed, instead of downloading them. Without '
+                             'path, the clone is kept in the rdoutils cache '
+                             'directory')
+    parser.add_argument('--no-http-cache', dest='http_cache',
+                        action='store_false', default=True,
+                        help='Download all the files instead of using the '
+                             'local HTTP cache')
     return parser.parse_args()
 
 
@@ -31,30 +43,40 @@ def format_time(time):
 
 def main():
     args = parse_args()
+    if not args.http_cache:
+        http_cache.disable()
+    if args.releases_repo is not None:
+        releases_utils.use_releases_repo(args.releases_repo or None)
+    from distroinfo import info
+
     if args.number:
         after_fmt = None
     else:
         after = datetime.datetime.now() - datetime.timedelta(days=args.days)
         after_fmt = after.strftime('%Y-%m-%d')
-    reviews = review_utils.get_osp_releases_reviews(args.release,
-                                                    after=after_fmt,
-                                                    number=args.number,
-                                                    status='merged')
+    reviews = review_utils.iter_osp_releases_reviews(args.release,
+                                                     after=after_fmt,
+                                                     number=args.number,
+                                                     status='merged')
 
     distroinfo = info.DistroInfo(
         info_files='rdo.yml',
         remote_info=rdoinfo_repo)
     inforepo = distroinfo.get_info()
+    index = rdoinfo.RdoinfoIndex(inforepo['packages'])
     for review in reviews:
         submitted = format_time(review['submitted'])
         review_number = review['_number']
         releases = releases_utils.get_new_releases_review(review)
         for release in releases:
             for repo in release['repos']:
-                pkg = query.find_package(inforepo, repo, strict=True)
+                pkg = index.find(repo)
                 if pkg:
                     name = pkg['name']
                 else:
                     name = repo
                 print("%s %s %s %s" % (review_number, submitted,
                                        release['version'], name))
+    # stdout only lists the releases
+    print("INFO: HTTP cache: %s" % http_cache.format_stats(),
+          file=sys.stderr)
@@ -0,0 +1,137 @@
+import argparse
+import csv
+import json
+import sys
+
+from rdoutils import cbs_mirror
+from rdoutils import cbs_utils
+
+FIELDS = ['release', 'package', 'status', 'release_nvr', 'testing_nvr',
+          'pending_nvr']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='List builds pending to be '
+                                     'moved from testing to release tags in '
+                                     'CBS')
+    parser.add_argument('releases', nargs='+', metavar='RELEASE',
+                        help='Release to check, as common, zed, antelope...')
+    parser.add_argument('-t', '--tag-prefix', dest='tag_prefix',
+                        default='cloud9s-openstack',
+                        help='Prefix of the CBS tags (default: '
+                             '%(default)s)')
+    parser.add_argument('-f', '--format', dest='format', default='json',
+                        choices=['json', 'csv', 'text'],
+                        help='Output format (default: %(default)s)')
+    parser.add_argument('-m', '--mirror', dest='mirror', action='store_true',
+                        default=False,
+                        help='Read tags from the local CBS mirror (see '
+                             'rdo_cbs_tagged) instead of querying CBS')
+    return parser.parse_args()
+
+
+def get_tags(tag_prefix, release):
+    tags = {'release': "%s-%s-release" % (tag_prefix, release),
+            'testing': "%s-%s-testing" % (tag_prefix, release)}
+    if release == 'common':
+        tags['pending'] = "%s-%s-pending" % (tag_prefix, release)
+    return tags
+
+
+def get_latest_builds(tags, mirror=False):
+    """ Return the latest builds in each tag, indexed by tag and package """
+    if mirror:
+        tags_mirror = cbs_mirror.CBSTagMirror()
+        tags_mirror.sync(tags)
+        listings = {tag: tags_mirror.list_tagged(tag, latest=True)
+                    for tag in tags}
+        tags_mirror.close()
+    else:
+        listings = cbs_utils.list_tagged(tags, latest=True)
+    return {tag: {b['package_name']: b for b in builds}
+            for tag, builds in listings.items()}
+
+
+def evr(build):
+    epoch = build.get('epoch')
+    return (str(epoch) if epoch is not None else '0', build['version'],
+            build['release'])
+
+
+def compare_release(release, tags, latest):
+    """ Compare release and testing tags of a release. Returns a record for
+    each package with a different build in both tags and for each build in
+    the pending tag.
+    """
+    import rpm
+
+    records = []
+    released = latest[tags['release']]
+    testing = latest[tags['testing']]
+    for package in sorted(set(released) | set(testing)):
+        rel_build = released.get(package)
+        test_build = testing.get(package)
+        if rel_build and test_build:
+            comp = rpm.labelCompare(evr(test_build), evr(rel_build))
+            if comp == 0:
+                continue
+            status = 'newer' if comp > 0 else 'older'
+        elif test_build:
+            status = 'new'
+        else:
+            status = 'missing-in-testing'
+        records.append({'release': release,
+                        'package': package,
+                        'status': status,
+                        'release_nvr': rel_build['nvr'] if rel_build else None,
+                        'testing_nvr': (test_build['nvr'] if test_build
+                                        else None),
+                        'pending_nvr': None})
+    if 'pending' in tags:
+        for package, build in sorted(latest[tags['pending']].items()):
+            records.append({'release': release,
+                            'package': package,
+                            'status': 'pending',
+                            'release_nvr': None,
+                            'testing_nvr': None,
+                            'pending_nvr': build['nvr']})
+    return records
+
+
+def print_text(records, releases):
+    # Same output as the former list-pending-updates.sh
+    for release in releases:
+        rel_records = [r for r in records if r['release'] == release]
+        if release == 'common':
+            print("======= Pending updates from %s-pending =======" % release)
+            for record in rel_records:
+                if record['status'] == 'pending':
+                    print(record['pending_nvr'])
+        print("======= Pending updates from %s-testing =======" % release)
+        for record in rel_records:
+            if record['release_nvr'] and record['status'] != 'pending':
+                print("-%s" % record['release_nvr'])
+            if record['testing_nvr']:
+                print("+%s" % record['testing_nvr'])
+
+
+def main():
+    args = parse_args()
+    release_tags = {release: get_tags(args.tag_prefix, release)
+                    for release in args.releases}
+    all_tags = [tag for tags in release_tags.values()
+                for tag in tags.values()]
+    # Latest builds of all the tags of all the releases are fetched at once
+    latest = get_latest_builds(all_tags, mirror=args.mirror)
+    records = []
+    for release in args.releases:
+        records.extend(compare_release(release, release_tags[release],
+                                       latest))
+    if args.format == 'json':
+        print(json.dumps(records, indent=2))
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    else:
+        print_text(records, args.releases)
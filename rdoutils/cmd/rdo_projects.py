@@ -20,6 +20,7 @@ def parse_args():
 
 def main():
     args = parse_args()
+    rdoinfo.init_local_info()
     client = review_utils.get_gerrit_client('rdo')
     if args.release:
         dist_in_rel = rdoinfo.get_projects_distgit(tag=args.release)
@@ -0,0 +1,31 @@
+import argparse
+import time
+
+from rdoutils import rdoinfo
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compile an rdoinfo '
+                                     'checkout into binary snapshots used by '
+                                     'rdoutils tools for fast lookups')
+    parser.add_argument('-l', '--rdoinfo-location', dest='location',
+                        default=rdoinfo.local_info,
+                        help='rdoinfo location (default: %(default)s)')
+    parser.add_argument('-f', '--info-file', dest='info_files',
+                        action='append', default=None,
+                        help='rdoinfo file to compile, can be repeated '
+                             '(default: rdo.yml and rdo-full.yml)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    info_files = args.info_files or ['rdo.yml', 'rdo-full.yml']
+    for info_file in info_files:
+        start = time.time()
+        snapshot = rdoinfo.compile_info(info_files=info_file,
+                                        local_dir=args.location)
+        print("%s: %d packages compiled to %s in %.2fs" % (
+              info_file, len(snapshot['info']['packages']),
+              rdoinfo.get_snapshot_file(args.location, info_file),
+              time.time() - start))
@@ -9,7 +9,6 @@
 import argparse
 import copy
 
-from distroinfo import info
 from rdoutils import rdoinfo
 
 
@@ -21,6 +20,10 @@ def parse_args():
                         help='tag to update')
     parser.add_argument('-l', '--rdoinfo-location', dest='location',
                         default='.', help='rdoinfo location')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        default=False,
+                        help='Show the changes to rdoinfo instead of '
+                             'writing them')
     return parser.parse_args()
 
 
@@ -85,10 +88,10 @@ def update_uc():
     rdoinfo_dir = args.location
     uc = load_uc(filter_all_minus_tripleo)
     uc_projects = list(uc.keys())
+    changes = []
 
-    distroinfo = info.DistroInfo(info_files='rdo-full.yml',
-                                 local_info=rdoinfo_dir)
-    info_rdo = distroinfo.get_info()
+    info_rdo = rdoinfo.get_info(info_files='rdo-full.yml',
+                                local_dir=rdoinfo_dir)
     DEFAULT_RELEASES = info_rdo['package-default']['tags']
     RELEASES_PUPPET = info_rdo['package-configs']['rpmfactory-puppet']['tags']
     for pkg in info_rdo['packages']:
@@ -130,20 +133,22 @@ def update_uc():
                 if prev_version != new_version:
                     print("%s updated from %s to %s" %
                           (project, prev_version, new_version))
-                    rdoinfo.update_tag('tags', project, release_tag, tag_value,
-                                       local_dir=rdoinfo_dir)
+                    changes.append(('tags', project, release_tag, tag_value))
                 else:
                     print("%s %s already up to date" %
                           (project, new_version))
             else:
                 print("%s first time pin to %s" %
                       (project, new_version))
-                rdoinfo.update_tag('tags', project, release_tag, tag_value,
-                                   local_dir=rdoinfo_dir)
+                changes.append(('tags', project, release_tag, tag_value))
             uc_projects.remove(project_uc)
         else:
             # "%s not found in upper-constraints" % project
             pass
+    diff = rdoinfo.update_tags(changes, local_dir=rdoinfo_dir,
+                               dry_run=args.dry_run)
+    if args.dry_run:
+        print(diff)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,179 @@
+import json
+
+from rdoutils import cache_utils
+from rdoutils import releases_repo
+from rdoutils import yaml_utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliverables (
+    path TEXT PRIMARY KEY,
+    series TEXT NOT NULL,
+    name TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    team TEXT,
+    type TEXT,
+    version TEXT,
+    repos TEXT NOT NULL,
+    branches TEXT NOT NULL,
+    stable_branch INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliverables_series
+    ON deliverables (series, name);
+"""
+
+DELIVERABLES_DIR = 'deliverables'
+
+
+def get_default_catalog_path():
+    return cache_utils.get_db_path('deliverables')
+
+
+def parse_deliverable(content):
+    """ Return the information indexed in the catalog from the content of a
+    deliverable file.
+    """
+    deliverable = yaml_utils.load(content) or {}
+    releases = deliverable.get('releases') or []
+    version = None
+    repos = []
+    if releases:
+        latest_release = releases[-1]
+        version = latest_release.get('version')
+        repos = [p['repo'] for p in latest_release.get('projects', [])]
+    branches = [b['name'] for b in deliverable.get('branches') or []]
+    return {'team': deliverable.get('team'),
+            'type': deliverable.get('type'),
+            'version': version,
+            'repos': repos,
+            'branches': branches}
+
+
+class DeliverablesCatalog(object):
+    """ Index of the deliverable files of openstack/releases by series.
+
+    The catalog is built from a local clone of openstack/releases (see
+    ReleasesRepo) and stored in SQLite. Each update only parses the files
+    modified since the last indexed commit. Usage example:
+
+        catalog = DeliverablesCatalog()
+        catalog.update()
+        catalog.list_deliverables('zed', stable_branch=True)
+    """
+
+    def __init__(self, path=None, repo=None):
+        self.path = path or get_default_catalog_path()
+        self._repo = repo
+        self.db = cache_utils.connect_db(self.path, SCHEMA)
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = releases_repo.ReleasesRepo()
+        return self._repo
+
+    def close(self):
+        self.db.close()
+
+    def get_indexed_commit(self):
+        row = self.db.execute("SELECT value FROM state "
+                              "WHERE key = 'commit'").fetchone()
+        return row['value'] if row else None
+
+    def update(self, branch='master', fetch=True):
+        """ Index the deliverables at the head of branch in the releases
+        repo. Returns the number of files parsed.
+        """
+        if fetch:
+            self.repo.fetch_branches()
+        commit = self.repo.git('rev-parse', 'refs/heads/%s' % branch).strip()
+        indexed = self.get_indexed_commit()
+        if commit == indexed:
+            return 0
+        if indexed and self.repo.has_commit(indexed):
+            changes = self._get_changes(indexed, commit)
+        else:
+            changes = [('A', path) for path in self._list_files(commit)]
+            with self.db:
+                self.db.execute("DELETE FROM deliverables")
+        parsed = 0
+        with self.db:
+            for status, path in changes:
+                if status == 'D':
+                    self.db.execute("DELETE FROM deliverables WHERE path = ?",
+                                    (path,))
+                    continue
+                blob, content = self.repo.read_blob(commit, path)
+                if content is None:
+                    continue
+                self._index(path, blob, content)
+                parsed += 1
+            self.db.execute("INSERT OR REPLACE INTO state "
+                            "VALUES ('commit', ?)", (commit,))
+        return parsed
+
+    def _is_deliverable(self, path):
+        parts = path.split('/')
+        return (len(parts) == 3 and parts[0] == DELIVERABLES_DIR and
+                parts[2].endswith('.yaml'))
+
+    def _list_files(self, commit):
+        output = self.repo.git('ls-tree', '-r', '--name-only', commit,
+                               '--', DELIVERABLES_DIR)
+        return [p for p in output.splitlines() if self._is_deliverable(p)]
+
+    def _get_changes(self, old, new):
+        output = self.repo.git('diff', '--name-status', '--no-renames',
+                               old, new, '--', DELIVERABLES_DIR)
+        changes = []
+        for line in output.splitlines():
+            status, path = line.split('\t', 1)
+            if self._is_deliverable(path):
+                changes.append((status[0], path))
+        return changes
+
+    def _index(self, path, blob, content):
+        _, series, filename = path.split('/')
+        info = parse_deliverable(content)
+        stable_branch = any(b.startswith('stable/') for b in info['branches'])
+        self.db.execute("INSERT OR REPLACE INTO deliverables "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (path, series, filename[:-len('.yaml')], blob,
+                         info['team'], info['type'], info['version'],
+                         json.dumps(info['repos']),
+                         json.dumps(info['branches']), int(stable_branch)))
+
+    def _to_deliverable(self, row):
+        deliverable = dict(row)
+        deliverable['repos'] = json.loads(deliverable['repos'])
+        deliverable['branches'] = json.loads(deliverable['branches'])
+        deliverable['stable_branch'] = bool(deliverable['stable_branch'])
+        return deliverable
+
+    def list_deliverables(self, series, stable_branch=None):
+        """ Return the deliverables of series, only those with (or without)
+        a stable branch if stable_branch is True (or False).
+        """
+        query = "SELECT * FROM deliverables WHERE series = ?"
+        params = [series]
+        if stable_branch is not None:
+            query += " AND stable_branch = ?"
+            params.append(int(stable_branch))
+        query += " ORDER BY name"
+        return [self._to_deliverable(row) for row in
+                self.db.execute(query, params)]
+
+    def get_deliverable(self, series, name):
+        row = self.db.execute("SELECT * FROM deliverables WHERE series = ? "
+                              "AND name = ?", (series, name)).fetchone()
+        if row:
+            return self._to_deliverable(row)
+        return None
+
+    def list_series(self):
+        rows = self.db.execute("SELECT DISTINCT series FROM deliverables "
+                               "ORDER BY series")
+        return [row['series'] for row in rows]
@@ -0,0 +1,358 @@
+import fcntl
+import os
+import shutil
+import subprocess
+import threading
+
+from rdoutils import cache_utils
+from rdoutils import rdoinfo
+
+# Remotes configured in the mirrors, as rdopkg clone does, with the rdoinfo
+# key of their url. Only FETCH_REMOTES are fetched.
+REMOTES = [
+    ('origin', 'distgit'),
+    ('patches', 'patches'),
+    ('upstream', 'upstream'),
+    ('review-patches', 'review-patches'),
+    ('review-origin', 'review-origin'),
+]
+FETCH_REMOTES = ['origin', 'upstream']
+REVIEW_REMOTES = ['review-patches', 'review-origin']
+
+# Maximum size of the mirrors, in MiB
+DEFAULT_MAX_SIZE = 10240
+
+# File touched on each checkout, its mtime is used for eviction
+LAST_USED_FILE = 'rdoutils-last-used'
+
+
+def get_default_store_path():
+    return cache_utils.get_cache_path('distgits')
+
+
+def get_max_size():
+    size = os.environ.get('RDOUTILS_DISTGIT_STORE_SIZE', DEFAULT_MAX_SIZE)
+    return int(size) * 1024 * 1024
+
+
+def tidy_ssh_user(url, user):
+    """ Set user in a ssh:// url, as rdopkg clone does for review remotes """
+    if not url or not user or not url.startswith('ssh://'):
+        return url
+    host = url[len('ssh://'):]
+    if '@' in host.split('/', 1)[0]:
+        host = host.split('@', 1)[1]
+    return 'ssh://%s@%s' % (user, host)
+
+
+def _load_rdopkg_index():
+    from rdopkg.actionmods import rdoinfo as rdopkg_rdoinfo
+
+    info = rdopkg_rdoinfo.get_distroinfo().get_info()
+    return rdoinfo.RdoinfoIndex(info['packages'])
+
+
+# RdoinfoIndex of the rdoinfo configured in rdopkg, fetched once
+_rdopkg_index = cache_utils.Shared(_load_rdopkg_index)
+
+
+def get_package(package, local_dir=rdoinfo.local_info):
+    """ Return the rdoinfo information of package from the rdoinfo in
+    local_dir or, if there is none, from the rdoinfo configured in rdopkg.
+    The info file read is the one of rdopkg clone.
+    """
+    from rdopkg.actionmods import rdoinfo as rdopkg_rdoinfo
+
+    info_file = rdopkg_rdoinfo.info_file()
+    if os.path.exists(os.path.join(local_dir, info_file)):
+        index = rdoinfo.get_index(info_files=info_file, local_dir=local_dir)
+    else:
+        index = _rdopkg_index.get()
+    pkg = index.get_by_name(package)
+    if pkg is None:
+        raise rdoinfo.NotInRdoinfo("Package %s not found in rdoinfo" %
+                                   package)
+    return pkg
+
+
+def _dir_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return size
+
+
+class DistgitStore(object):
+    """ Bare mirrors of the distgit repositories of RDO packages.
+
+    Each mirror has the remotes of a rdopkg clone. The distgit (origin) and
+    upstream remotes are fetched incrementally on every checkout, which
+    creates a git worktree of a distgit branch sharing the mirror objects.
+    Usage example:
+
+        store = DistgitStore()
+        store.checkout('python-oslo-log', 'zed-rdo', '/tmp/python-oslo-log')
+        ...
+        store.remove('/tmp/python-oslo-log')
+        store.gc()
+
+    A lock file per mirror serializes its updates between threads and
+    processes.
+    """
+
+    def __init__(self, path=None, max_size=None):
+        self.path = path or get_default_store_path()
+        self.max_size = max_size if max_size is not None else get_max_size()
+        self.lock = threading.Lock()
+        self._locks = {}
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    def mirror_path(self, package):
+        return os.path.join(self.path, '%s.git' % package)
+
+    def git(self, mirror, *args, **kwargs):
+        return subprocess.check_output(['git', '-C', mirror] + list(args),
+                                       universal_newlines=True, **kwargs)
+
+    def _mirror_lock(self, package):
+        with self.lock:
+            lock = self._locks.get(package)
+            if lock is None:
+                lock = self._locks[package] = _MirrorLock(
+                    self.mirror_path(package) + '.lock')
+        return lock
+
+    def _get_remotes(self, mirror):
+        try:
+            output = self.git(mirror, 'config', '--get-regexp',
+                              r'^remote\..*\.url$')
+        except subprocess.CalledProcessError:
+            # no remote configured
+            return {}
+        remotes = {}
+        for line in output.splitlines():
+            key, url = line.split(' ', 1)
+            remotes[key[len('remote.'):-len('.url')]] = url
+        return remotes
+
+    def _configure_remotes(self, mirror, pkg, user=None):
+        current = self._get_remotes(mirror)
+        for remote, key in REMOTES:
+            url = pkg.get(key)
+            if remote in REVIEW_REMOTES:
+                url = tidy_ssh_user(url, user)
+            if not url:
+                if remote in current:
+                    self.git(mirror, 'remote', 'remove', remote)
+            elif remote not in current:
+                self.git(mirror, 'remote', 'add', remote, url)
+            elif current[remote] != url:
+                self.git(mirror, 'remote', 'set-url', remote, url)
+
+    def update(self, package, pkg=None, user=None):
+        """ Create or update the mirror of package, fetching only the new
+        objects of its distgit and upstream remotes. pkg is the rdoinfo
+        information of the package, looked up with get_package by default.
+        """
+        if pkg is None:
+            pkg = get_package(package)
+        mirror = self.mirror_path(package)
+        with self._mirror_lock(package):
+            if not os.path.exists(os.path.join(mirror, 'HEAD')):
+                subprocess.check_call(['git', 'init', '--quiet', '--bare',
+                                       mirror])
+            self._configure_remotes(mirror, pkg, user=user)
+            remotes = self._get_remotes(mirror)
+            for remote in FETCH_REMOTES:
+                if remote not in remotes:
+                    continue
+                args = ['fetch', '--quiet', '--prune', remote]
+                if remote == 'upstream':
+                    # release tags are looked up in upstream
+                    args.insert(1, '--tags')
+                self.git(mirror, *args)
+        return mirror
+
+    def checkout(self, package, branch, dest, pkg=None, user=None,
+                 fetch=True):
+        """ Check out branch of the distgit of package in dest, replacing
+        anything existing there, as a worktree of the updated mirror. The
+        local branch tracks origin/branch and is reset to it. Other
+        worktrees of the branch, i.e. checkouts in other directories, are
+        left with a detached HEAD.
+
+        Raises BranchNotFound if the distgit has no such branch and
+        CheckoutFailed if git fails to create the worktree.
+        """
+        if fetch:
+            mirror = self.update(package, pkg=pkg, user=user)
+        else:
+            mirror = self.mirror_path(package)
+        dest = os.path.abspath(dest)
+        with self._mirror_lock(package):
+            remote_ref = 'refs/remotes/origin/%s' % branch
+            try:
+                self.git(mirror, 'show-ref', '--verify', '--quiet',
+                         remote_ref)
+            except subprocess.CalledProcessError:
+                raise BranchNotFound("Distgit for %s does not contain "
+                                     "branch %s" % (package, branch))
+            self._remove_worktree(mirror, dest)
+            self._release_branch(mirror, package, branch)
+            try:
+                self.git(mirror, 'worktree', 'add', '--quiet', '--track',
+                         '-B', branch, dest, 'origin/%s' % branch,
+                         stderr=subprocess.PIPE)
+            except subprocess.CalledProcessError as e:
+                raise CheckoutFailed("Failed to check out branch %s of %s "
+                                     "in %s: %s" % (branch, package, dest,
+                                                    e.stderr.strip()))
+            last_used = os.path.join(mirror, LAST_USED_FILE)
+            with open(last_used, 'a'):
+                os.utime(last_used)
+        return dest
+
+    def _get_worktrees(self, mirror):
+        """ Return the branch checked out in each worktree of mirror,
+        indexed by path. The branch is None for detached worktrees.
+        """
+        worktrees = {}
+        path = None
+        output = self.git(mirror, 'worktree', 'list', '--porcelain')
+        for line in output.splitlines():
+            if line.startswith('worktree '):
+                path = line[len('worktree '):]
+                worktrees[path] = None
+            elif line.startswith('branch refs/heads/'):
+                worktrees[path] = line[len('branch refs/heads/'):]
+        return worktrees
+
+    def _release_branch(self, mirror, package, branch):
+        """ Detach the HEAD of the other worktrees of branch, as git refuses
+        to reset a branch checked out in another worktree. Their files and
+        local commits are kept.
+        """
+        for path, worktree_branch in self._get_worktrees(mirror).items():
+            if worktree_branch != branch or path == mirror:
+                continue
+            try:
+                subprocess.check_output(['git', '-C', path, 'checkout',
+                                         '--quiet', '--detach'],
+                                        stderr=subprocess.STDOUT,
+                                        universal_newlines=True)
+            except subprocess.CalledProcessError as e:
+                raise CheckoutFailed("Branch %s of %s is checked out in %s "
+                                     "and could not be detached: %s" %
+                                     (branch, package, path,
+                                      e.output.strip()))
+
+    def _remove_worktree(self, mirror, dest):
+        if os.path.exists(dest):
+            try:
+                self.git(mirror, 'worktree', 'remove', '--force', dest,
+                         stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                # not a worktree of this mirror, i.e. a previous clone
+                shutil.rmtree(dest)
+        self.git(mirror, 'worktree', 'prune')
+
+    def remove(self, dest):
+        """ Remove a worktree created by checkout """
+        dest = os.path.abspath(dest)
+        git_file = os.path.join(dest, '.git')
+        if os.path.isfile(git_file):
+            with open(git_file) as f:
+                gitdir = f.read().strip()[len('gitdir: '):]
+            # gitdir is <mirror>/worktrees/<name>
+            mirror = os.path.dirname(os.path.dirname(gitdir))
+            package = os.path.basename(mirror)[:-len('.git')]
+            if os.path.dirname(mirror) == self.path:
+                with self._mirror_lock(package):
+                    self._remove_worktree(mirror, dest)
+                return
+        if os.path.exists(dest):
+            shutil.rmtree(dest)
+
+    def list_mirrors(self):
+        """ Return the packages having a mirror in the store """
+        return sorted(name[:-len('.git')] for name in os.listdir(self.path)
+                      if name.endswith('.git') and
+                      os.path.isdir(os.path.join(self.path, name)))
+
+    def _last_used(self, mirror):
+        try:
+            return os.stat(os.path.join(mirror, LAST_USED_FILE)).st_mtime
+        except OSError:
+            return os.stat(mirror).st_mtime
+
+    def _has_worktrees(self, mirror):
+        worktrees = os.path.join(mirror, 'worktrees')
+        return os.path.isdir(worktrees) and bool(os.listdir(worktrees))
+
+    def gc(self, max_size=None):
+        """ Prune removed worktrees, repack the mirrors when git finds it
+        useful and remove the least recently used mirrors without worktree
+        until the store is smaller than max_size bytes. Returns the list of
+        packages removed.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        mirrors = []
+        for package in self.list_mirrors():
+            mirror = self.mirror_path(package)
+            with self._mirror_lock(package):
+                self.git(mirror, 'worktree', 'prune')
+                self.git(mirror, 'gc', '--auto', '--quiet')
+            mirrors.append((self._last_used(mirror), package,
+                            _dir_size(mirror)))
+        total = sum(size for _, _, size in mirrors)
+        removed = []
+        for last_used, package, size in sorted(mirrors):
+            if total <= max_size:
+                break
+            mirror = self.mirror_path(package)
+            with self._mirror_lock(package):
+                if self._has_worktrees(mirror):
+                    continue
+                shutil.rmtree(mirror)
+            total -= size
+            removed.append(package)
+        return removed
+
+    def size(self):
+        return sum(_dir_size(self.mirror_path(package))
+                   for package in self.list_mirrors())
+
+
+class _MirrorLock(object):
+    """ Lock of a mirror held by a single thread of all the processes """
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.Lock()
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+        self.thread_lock.release()
+
+
+class BranchNotFound(Exception):
+    pass
+
+
+class CheckoutFailed(Exception):
+    pass
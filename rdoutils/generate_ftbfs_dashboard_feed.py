@@ -1,7 +1,9 @@
 import argparse
-import pandas
+import io
+from rdoutils import http_cache
 from rdoutils import review_utils
-import urllib.error
+
+GERRIT_REVIEW_URL = 'https://review.rdoproject.org/r/#/c/'
 
 
 def parse_args():
@@ -16,6 +18,10 @@ def parse_args():
                         required=False,
                         help='File to store generated report. If empty, report'
                              ' will be displayed to stdout.')
+    parser.add_argument('--no-http-cache', dest='http_cache',
+                        action='store_false', default=True,
+                        help='Download the reports instead of revalidating'
+                             ' the copies in the local HTTP cache.')
     return parser.parse_args()
 
 
@@ -24,15 +30,17 @@ def get_ftbfs_failures(release):
     This function is parsing csv report to look for any occurenence
     of FTBFS and store this information
     """
+    import pandas
+
     url = "https://trunk.rdoproject.org/%s/status_report.csv" % release
     print("INFO: Analysing report from URL: ", url)
 
-    try:
-        df_data = pandas.read_csv(url, index_col='Project')
-    except urllib.error.HTTPError as e:
-        print("Result: ", e.code, e.reason)
+    report = http_cache.get(url)
+    if report.status_code != 200:
+        print("Result: ", report.status_code)
         print("Specified report url", url, "does not exists.")
         return
+    df_data = pandas.read_csv(io.StringIO(report.text), index_col='Project')
 
     df_data.drop(["Extended Sha", "Packages"], axis=1, inplace=True)
     failed_reviews = df_data[df_data["Status"] == "FAILED"]
@@ -49,6 +57,7 @@ def expand_report(report_df):
     link to gerrit review (if exists). Also it does some clean up of unneeded
     columns.
     """
+    import pandas
 
     if report_df.empty:
         print("INFO: Current FTBFS report has no entries.")
@@ -62,7 +71,13 @@ def expand_report(report_df):
 
     report_df.reset_index(inplace=True)
 
-    for index in report_df.index:
+    # Reviews of all the failing packages are searched in batch
+    ftbfs_keys = [(report_df["Project"][index].split("-")[1],
+                   report_df["Release"][index].split("-")[1])
+                  for index in report_df.index]
+    ftbfs_reviews = find_ftbfs_reviews_batch(ftbfs_keys, "open")
+
+    for index, ftbfs_key in zip(report_df.index, ftbfs_keys):
         component = report_df["Release"][index]
         if "centos7-train" not in component:
             component += "/component/" + report_df['Component'][index]
@@ -75,11 +90,7 @@ def expand_report(report_df):
 
         ftbfs_date = pandas.to_datetime(report_df['Timestamp'][index],
                                         unit='s')
-        ftbfs_review = find_ftbfs_reviews(report_df["Project"]
-                                          [index].split("-")[1],
-                                          report_df["Release"]
-                                          [index].split("-")[1],
-                                          "open")
+        ftbfs_review = ftbfs_reviews[ftbfs_key]
 
         report_df.loc[index, "Logs"] = rpmbuild_log
         report_df.loc[index, "Date of FTBFS"] = ftbfs_date
@@ -92,37 +103,72 @@ def expand_report(report_df):
     return report_df
 
 
+def _ftbfs_branch(branch):
+    if branch and "master" in branch:
+        return "rpm-master"
+    elif branch:
+        return branch + "-rdo"
+    return branch
+
+
 def find_ftbfs_reviews(project, branch, status):
     """
     This function is calling gerrit API to list all current
     FTBFS reviews, with specified project, branch and status.
     """
-    client = review_utils.get_gerrit_client('rdo')
-    gerrit_url = 'https://review.rdoproject.org/r/#/c/'
+    return find_ftbfs_reviews_batch([(project, branch)],
+                                    status)[(project, branch)]
 
-    if branch and "master" in branch:
-        branch = "rpm-master"
-    elif branch:
-        branch = branch + "-rdo"
 
-    reviews = review_utils.get_reviews_project(client, project,
-                                               branch=branch,
-                                               status=status,
-                                               intopic="FTBFS")
-    if reviews:
-        latest_review = 0
-        for review in reviews[::-1]:
-            if latest_review < review['_number']:
-                latest_review = review['_number']
+def find_ftbfs_reviews_batch(ftbfs_keys, status):
+    """
+    Find the latest FTBFS review for each (project, branch) in ftbfs_keys,
+    with a few OR-combined gerrit queries for each branch. Returns a dict
+    with the review url, or None, for each (project, branch).
+    """
+    client = review_utils.get_gerrit_client('rdo')
 
-        return gerrit_url + str(latest_review)
+    projects_branch = {}
+    for project, branch in ftbfs_keys:
+        projects_branch.setdefault(_ftbfs_branch(branch), set()).add(project)
+
+    latest_reviews = {}
+    for gerrit_branch, projects in projects_branch.items():
+        projects = sorted(projects)
+        reviews = review_utils.iter_reviews_projects(client, projects,
+                                                     branch=gerrit_branch,
+                                                     status=status,
+                                                     intopic="FTBFS")
+        for review in reviews:
+            for project in projects:
+                if not review_utils.project_matches(project,
+                                                    review['project']):
+                    continue
+                key = (project, gerrit_branch)
+                if latest_reviews.get(key, 0) < review['_number']:
+                    latest_reviews[key] = review['_number']
+
+    ftbfs_reviews = {}
+    for project, branch in ftbfs_keys:
+        latest_review = latest_reviews.get((project, _ftbfs_branch(branch)))
+        if latest_review:
+            ftbfs_reviews[(project, branch)] = (GERRIT_REVIEW_URL +
+                                                str(latest_review))
+        else:
+            ftbfs_reviews[(project, branch)] = None
+    return ftbfs_reviews
 
 
 def main():
     releases = []
-    ftbfs_failures_df = pandas.DataFrame()
 
     args = parse_args()
+    import pandas
+
+    if not args.http_cache:
+        http_cache.disable()
+
+    ftbfs_failures_df = pandas.DataFrame()
 
     if args.release is None:
         releases = ["centos9-antelope", "centos9-bobcat", "centos9-caracal",
@@ -135,6 +181,8 @@ def main():
         ftbfs_failures_df = pandas.concat([ftbfs_failures_df,
                                            get_ftbfs_failures(release)])
 
+    print("INFO: HTTP cache:", http_cache.format_stats())
+
     if args.report_file is None:
         print(expand_report(ftbfs_failures_df))
     elif args.report_file is not None and ftbfs_failures_df.empty:
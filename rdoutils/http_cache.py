@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+import time
+
+from rdoutils import cache_utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access
+    ON responses (last_access);
+"""
+
+# URLs addressing content by commit, which never changes once fetched
+IMMUTABLE_URLS = [
+    re.compile(r'^https?://opendev\.org/.*/raw/commit/[0-9a-f]{40}/'),
+    re.compile(r'^https?://raw\.githubusercontent\.com/[^/]+/[^/]+/'
+               r'[0-9a-f]{40}/'),
+]
+
+# Maximum size of the cached content, in MiB
+DEFAULT_MAX_SIZE = 256
+
+# Counters of the requests served by the cache in this process.
+# hits are served without any request, revalidated after a 304 response
+# to a conditional request and misses are downloaded.
+stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+_enabled = True
+_cache = cache_utils.Shared(lambda: HTTPCache())
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_session = None
+
+
+def disable():
+    """ Bypass the cache for all the requests of this process """
+    global _enabled
+    _enabled = False
+
+
+def is_immutable(url):
+    return any(regex.match(url) for regex in IMMUTABLE_URLS)
+
+
+def get_max_size():
+    size = os.environ.get('RDOUTILS_HTTP_CACHE_SIZE', DEFAULT_MAX_SIZE)
+    return int(size) * 1024 * 1024
+
+
+def _count(counter):
+    with _stats_lock:
+        stats[counter] += 1
+
+
+def format_stats():
+    return ("%(hits)s hits, %(revalidated)s revalidated, "
+            "%(misses)s misses" % stats)
+
+
+class CachedResponse(object):
+    """ Response to a GET request, with the attributes of a requests
+    Response used by rdoutils.
+    """
+
+    def __init__(self, url, status_code, content, content_type=None,
+                 from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        encoding = 'utf-8'
+        match = re.search(r'charset=([\w-]+)', self.content_type or '')
+        if match:
+            encoding = match.group(1)
+        return self.content.decode(encoding, errors='replace')
+
+
+class HTTPCache(object):
+    """ On-disk cache of HTTP responses stored in SQLite.
+
+    Least recently used responses are evicted when the cached content is
+    bigger than max_size bytes.
+    """
+
+    def __init__(self, path=None, max_size=None):
+        self.path = path or cache_utils.get_db_path('http-cache')
+        self.max_size = max_size or get_max_size()
+        self.lock = threading.Lock()
+        self.db = cache_utils.connect_db(self.path, SCHEMA, shared=True)
+
+    def lookup(self, url):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM responses WHERE url = ?",
+                                  (url,)).fetchone()
+        return row
+
+    def touch(self, url):
+        with self.lock, self.db:
+            self.db.execute("UPDATE responses SET last_access = ? "
+                            "WHERE url = ?", (time.time(), url))
+
+    def store(self, url, etag, last_modified, content_type, content):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO responses "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (url, etag, last_modified, content_type,
+                             content, len(content), time.time()))
+            self._evict()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) "
+                                "FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self.db.execute("SELECT url, size FROM responses "
+                               "ORDER BY last_access")
+        evicted = []
+        for row in rows:
+            if total <= self.max_size:
+                break
+            evicted.append((row['url'],))
+            total -= row['size']
+        self.db.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM responses")
+
+
+def get_cache():
+    return _cache.get()
+
+
+def _get_session():
+    global _session
+    import requests
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+    return _session
+
+
+def get(url, session=None, **kwargs):
+    """ GET url through the cache, using session if provided.
+
+    Responses of immutable URLs (see IMMUTABLE_URLS) are served from the
+    cache without any request. Other cached responses are revalidated with
+    If-None-Match and If-Modified-Since. Only 200 responses are cached.
+    Returns a CachedResponse.
+    """
+    session = session or _get_session()
+    if not _enabled:
+        response = session.get(url, **kwargs)
+        return CachedResponse(url, response.status_code, response.content,
+                              response.headers.get('Content-Type'))
+    cache = get_cache()
+    immutable = is_immutable(url)
+    entry = cache.lookup(url)
+    if entry and immutable:
+        _count('hits')
+        cache.touch(url)
+        return CachedResponse(url, 200, entry['content'],
+                              entry['content_type'], from_cache=True)
+    headers = dict(kwargs.pop('headers', None) or {})
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = session.get(url, headers=headers, **kwargs)
+    if entry and response.status_code == 304:
+        _count('revalidated')
+        cache.touch(url)
+        return CachedResponse(url, 200, entry['content'],
+                              entry['content_type'], from_cache=True)
+    _count('misses')
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    content_type = response.headers.get('Content-Type')
+    if response.status_code == 200 and (immutable or etag or last_modified):
+        cache.store(url, etag, last_modified, content_type,
+                    response.content)
+    return CachedResponse(url, response.status_code, response.content,
+                          content_type)
@@ -1,7 +1,5 @@
 
-import jenkins
 import time
-import validators
 
 JENKINS_URLS = {
     'rdo': 'https://ci.centos.org',
@@ -9,6 +7,9 @@ JENKINS_URLS = {
 
 
 def get_jenkins_client(url, user=None, password=None):
+    import jenkins
+    import validators
+
     if url in JENKINS_URLS.keys():
         jenkins_url = JENKINS_URLS[url]
     elif validators.url(url):
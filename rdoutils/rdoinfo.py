@@ -1,60 +1,326 @@
 
+import copy
+import difflib
+import hashlib
+import io
+import marshal
 import os
 import re
-from ruamel.yaml import YAML
+import subprocess
+import sys
+import threading
 
-from distroinfo import info
-from distroinfo import query
-from rdoutils import cbs_utils
-from rdopkg.utils import git
-from rdopkg import helpers
+from rdoutils import cache_utils
+from rdoutils import yaml_utils
+
+# distroinfo, rdopkg and koji are slow to import, so they are imported only
+# in the functions using them to keep commands startup fast.
 
 local_info = os.environ['HOME'] + '/rdoinfo'
-if not os.path.exists(local_info):
-    os.makedirs(local_info)
 
+# Version of the compiled snapshot format, bump it on incompatible changes
+SNAPSHOT_VERSION = 1
 
-def get_projects(info_files='rdo.yml', local_dir=local_info,
-                 tag=None, buildsys_tag=None):
+# Parsed rdoinfo snapshots indexed by (local_dir, info_files)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def init_local_info():
+    """ Create the default rdoinfo directory if it does not exist yet """
+    if not os.path.exists(local_info):
+        os.makedirs(local_info)
+
+
+def _get_recording_fetcher(local_dir):
+    """ Return a local info fetcher keeping track of the files it reads in
+    its files_read attribute, and of their state before they were read, as
+    _get_sources_state returns it, in its sources attribute.
+    """
+    from distroinfo import fetch
+
+    fetcher = fetch.LocalInfoFetcher(local_dir)
+    fetcher.files_read = []
+    fetcher.sources = []
+    get_file_content = fetcher.get_file_content
+
+    def recording_get_file_content(fn):
+        fetcher.files_read.append(fn)
+        # stat before reading, a file changed meanwhile is then stale
+        state = _get_sources_state(local_dir, [fn])
+        if state is None or fetcher.sources is None:
+            fetcher.sources = None
+        else:
+            fetcher.sources.extend(state)
+        return get_file_content(fn)
+
+    fetcher.get_file_content = recording_get_file_content
+    return fetcher
+
+
+def _get_sources_state(local_dir, files):
+    """ Return [path, mtime, size] for files, or None if any is missing """
+    sources = []
+    for fn in files:
+        try:
+            st = os.stat(os.path.join(local_dir, fn))
+        except OSError:
+            return None
+        sources.append([fn, st.st_mtime_ns, st.st_size])
+    return sources
+
+
+def _is_fresh(snapshot, local_dir):
+    """ Check if the source files of a snapshot have not changed """
+    files = [source[0] for source in snapshot['sources']]
+    return _get_sources_state(local_dir, files) == snapshot['sources']
+
+
+def _to_builtin(data):
+    # marshal only supports builtin types, not subclasses as OrderedDict
+    if isinstance(data, dict):
+        return {k: _to_builtin(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_to_builtin(v) for v in data]
+    return data
+
+
+def get_snapshot_file(local_dir, info_files):
+    """ Return the path of the compiled rdoinfo snapshot for info_files in
+    local_dir.
+    """
+    local_dir = os.path.abspath(local_dir)
+    snap_id = "%s:%s" % (local_dir, info_files)
+    snap_hash = hashlib.sha1(snap_id.encode()).hexdigest()
+    return os.path.join(cache_utils.get_cache_dir('rdoinfo'),
+                        "%s.snapshot" % snap_hash)
+
+
+def _load_snapshot(snapshot_file, local_dir):
+    try:
+        with open(snapshot_file, 'rb') as infile:
+            snapshot = marshal.load(infile)
+    except Exception:
+        return None
+    if not isinstance(snapshot, dict) or \
+            snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    if not _is_fresh(snapshot, local_dir):
+        return None
+    snapshot['index'] = RdoinfoIndex.from_positions(
+        snapshot['info']['packages'], snapshot.pop('positions'))
+    return snapshot
+
+
+def compile_info(info_files='rdo.yml', local_dir=local_info):
+    """ Parse rdoinfo and write it as a compiled snapshot.
+
+    The snapshot is a marshal dump of the parsed info, with the indexes
+    of RdoinfoIndex precomputed and the mtime and size of every file it
+    was built from. get_info loads it instead of parsing rdoinfo as long
+    as those files are unchanged. The snapshot is not saved if the info
+    can't be dumped with marshal.
+
+    Returns the parsed snapshot.
+    """
+    from distroinfo import info
+
+    local_dir = os.path.abspath(local_dir)
+    fetcher = _get_recording_fetcher(local_dir)
     distroinfo = info.DistroInfo(
         info_files=info_files,
-        local_info=local_dir)
-    inforepo = distroinfo.get_info()
+        fetcher=fetcher)
+    parsed_info = _to_builtin(distroinfo.get_info())
+    sources = fetcher.sources
+    if sources != _get_sources_state(local_dir, fetcher.files_read):
+        # a file changed while rdoinfo was parsed, do not save a snapshot
+        # which would look fresh
+        sources = None
+    index = RdoinfoIndex(parsed_info['packages'])
+    if sources is not None:
+        compiled = {'version': SNAPSHOT_VERSION,
+                    'sources': sources,
+                    'info': parsed_info,
+                    'positions': index.to_positions()}
+        try:
+            data = marshal.dumps(compiled)
+        except ValueError as e:
+            # types unsupported by marshal, as dates parsed from YAML
+            print("WARNING: rdoinfo snapshot of %s not saved: %s" %
+                  (info_files, e), file=sys.stderr)
+        else:
+            cache_utils.atomic_write(get_snapshot_file(local_dir, info_files),
+                                     data)
+    return {'sources': sources, 'info': parsed_info, 'index': index}
+
+
+def _get_snapshot(info_files, local_dir):
+    local_dir = os.path.abspath(local_dir)
+    snap_id = (local_dir, str(info_files))
+    # Concurrent callers wait for a single load of the snapshot
+    with _snapshots_lock:
+        snapshot = _snapshots.get(snap_id)
+        if (snapshot and snapshot['sources'] and
+                _is_fresh(snapshot, local_dir)):
+            return snapshot
+        snapshot = _load_snapshot(get_snapshot_file(local_dir, info_files),
+                                  local_dir)
+        if snapshot is None:
+            snapshot = compile_info(info_files=info_files,
+                                    local_dir=local_dir)
+        _snapshots[snap_id] = snapshot
+    return snapshot
+
+
+def get_info(info_files='rdo.yml', local_dir=local_info):
+    """ Return parsed rdoinfo from info_files in local_dir.
+
+    Parsed info is cached in memory and as a compiled snapshot on disk
+    (see compile_info), so rdoinfo is only parsed again after any of its
+    files changes. The returned data is shared between callers and must
+    not be modified.
+    """
+    return _get_snapshot(info_files, local_dir)['info']
+
+
+def get_index(info_files='rdo.yml', local_dir=local_info):
+    """ Return the RdoinfoIndex for info_files in local_dir.
+
+    The index is built once per parsed snapshot.
+    """
+    return _get_snapshot(info_files, local_dir)['index']
+
+
+class RdoinfoIndex(object):
+    """ Hash indexes over the packages in parsed rdoinfo.
+
+    Packages are indexed by name, project, upstream and review-origin URLs,
+    tag and buildsys-tag. Lookups return the same package dicts found in
+    the parsed info, in rdoinfo order.
+    """
+
+    def __init__(self, packages):
+        from distroinfo import query
+
+        self.packages = packages
+        self.by_name = {}
+        self.by_project = {}
+        self.by_url = {}
+        self.by_tag = {}
+        self.by_buildsys_tag = {}
+        # project and upstream stripped as in distroinfo.query.find_package
+        self._by_short_ref = {}
+        for package in packages:
+            self.by_name.setdefault(package['name'], []).append(package)
+            self.by_project.setdefault(package['project'], package)
+            for url_key in ('upstream', 'review-origin'):
+                url = package.get(url_key)
+                if url:
+                    self.by_url.setdefault(url, package)
+            self._by_short_ref.setdefault(package['project'].lower(),
+                                          package)
+            if package.get('upstream'):
+                short_ref = query.strip_project_url(package['upstream'])
+                self._by_short_ref.setdefault(short_ref, package)
+            for tag in (package.get('tags') or {}):
+                self.by_tag.setdefault(tag, []).append(package)
+            for tag in (package.get('buildsys-tags') or {}):
+                self.by_buildsys_tag.setdefault(tag, []).append(package)
+
+    def to_positions(self):
+        """ Return the indexes with packages replaced by their position in
+        the packages list, see from_positions.
+        """
+        positions = {}
+        pkg_pos = {id(package): pos for pos, package in
+                   enumerate(self.packages)}
+        for attr in ('by_project', 'by_url', '_by_short_ref'):
+            positions[attr] = {k: pkg_pos[id(v)] for k, v in
+                               getattr(self, attr).items()}
+        for attr in ('by_name', 'by_tag', 'by_buildsys_tag'):
+            positions[attr] = {k: [pkg_pos[id(p)] for p in v] for k, v in
+                               getattr(self, attr).items()}
+        return positions
+
+    @classmethod
+    def from_positions(cls, packages, positions):
+        """ Rebuild an index from the output of to_positions without
+        walking the packages again.
+        """
+        index = cls.__new__(cls)
+        index.packages = packages
+        for attr in ('by_project', 'by_url', '_by_short_ref'):
+            setattr(index, attr, {k: packages[v] for k, v in
+                                  positions[attr].items()})
+        for attr in ('by_name', 'by_tag', 'by_buildsys_tag'):
+            setattr(index, attr, {k: [packages[p] for p in v] for k, v in
+                                  positions[attr].items()})
+        return index
+
+    def get_by_name(self, name):
+        pkgs = self.by_name.get(name, [])
+        if len(pkgs) != 1:
+            return None
+        return pkgs[0]
+
+    def get_by_project(self, project):
+        return self.by_project.get(project)
+
+    def get_by_url(self, url):
+        return self.by_url.get(url)
+
+    def get_by_tag(self, tag):
+        return self.by_tag.get(tag, [])
+
+    def get_by_buildsys_tag(self, buildsys_tag):
+        return self.by_buildsys_tag.get(buildsys_tag, [])
+
+    def find(self, ref):
+        """ Same as distroinfo.query.find_package(info, ref, strict=True)
+        """
+        from distroinfo import query
+
+        pkgs = self.by_name.get(ref)
+        if pkgs:
+            return pkgs[0]
+        return self._by_short_ref.get(query.strip_project_url(ref))
+
+
+def get_projects(info_files='rdo.yml', local_dir=local_info,
+                 tag=None, buildsys_tag=None):
+    index = get_index(info_files=info_files, local_dir=local_dir)
 
-    all_packages = inforepo['packages']
     # If tag and buildys_tag are not specified it returns
     # all packages
     if tag is None and buildsys_tag is None:
-        return all_packages
+        return index.packages
     pkgs_tagged = []
     # If tag is specified, it looks for packages with the specified
     # value in tags dict.
     if tag is not None:
-        for package in all_packages:
-            if tag in package['tags'].keys():
-                pkgs_tagged.append(package)
+        pkgs_tagged.extend(index.get_by_tag(tag))
     # If buildsys_tag is specified, it looks for packages with the specified
     # value in buildsys-tags dict.
     if buildsys_tag is not None:
         if 'candidate' in buildsys_tag:
-            tagged_pkg_names = cbs_utils.list_pkg_names_tagged_in(buildsys_tag)
-            for package in all_packages:
-                if (package['name'] in tagged_pkg_names):
+            from rdoutils import cbs_utils
+
+            tagged_pkg_names = set(
+                cbs_utils.list_pkg_names_tagged_in(buildsys_tag))
+            for package in index.packages:
+                if package['name'] in tagged_pkg_names:
                     pkgs_tagged.append(package)
         else:
-            for package in all_packages:
-                if ('buildsys-tags' in package.keys()
-                        and buildsys_tag in package['buildsys-tags'].keys()):
-                    pkgs_tagged.append(package)
+            pkgs_tagged.extend(index.get_by_buildsys_tag(buildsys_tag))
     return pkgs_tagged
 
 
 def get_project(project, info_files='rdo.yml', local_dir=local_info):
-    all_packages = get_projects(info_files=info_files, local_dir=local_dir)
-    for package in all_packages:
-        if package['project'] == project:
-            return package
-    raise (NotInRdoinfo)
+    index = get_index(info_files=info_files, local_dir=local_dir)
+    package = index.get_by_project(project)
+    if package is None:
+        raise (NotInRdoinfo)
+    return package
 
 
 def update_tag(tag_type, project, tag_key, tag_value,
@@ -81,49 +347,113 @@ def update_tag(tag_type, project, tag_key, tag_value,
                     local_dir='/tmp/nfvinfo',
                     tags_filename='openvswitch2.13.yml')
 
+    To update many projects or tags at once use update_tags.
+    """
+    update_tags([(tag_type, project, tag_key, tag_value)],
+                info_files=info_files, local_dir=local_dir,
+                tags_filename=tags_filename,
+                update_all_files=update_all_files)
+
+
+def update_tags(changes, info_files='rdo-full.yml', local_dir=local_info,
+                tags_filename=None, update_all_files=True, dry_run=False):
+    """ Apply a list of (tag_type, project, tag_key, tag_value) changes to
+    the tags files in rdoinfo, following the conventions in update_tag.
+
+    rdoinfo is parsed once and each affected tags file is loaded once, all
+    its changes are applied in memory and then it is written once,
+    atomically. Nothing is written if any of the changes fails, and the
+    files already written are restored if writing another one fails. With
+    dry_run, files are not written at all.
+
+    Returns a unified diff of the changes applied to the tags files.
+
+    Usage example:
 
+        print(update_tags([('tags', 'oslo-config', 'ocata',
+                            {'source-branch': '3.22.2'}),
+                           ('tags', 'oslo-log', 'ocata',
+                            {'source-branch': '3.20.1'})],
+                          local_dir='/tmp/rdoinfo', dry_run=True))
     """
-    package = get_project(project, info_files=info_files,
-                          local_dir=local_dir)
-    if tag_type not in package.keys():
-        package[tag_type] = {}
-    package[tag_type][tag_key] = tag_value
-    # We update all tags for a given package to make sure we override
-    # properly the default tags from package configs the first time
-    # we update tags.
-    for tag in package[tag_type].keys():
-        if not update_all_files:
-            if tag != tag_key:
-                continue
-        updated = False
-        if tags_filename:
-            tags_file = os.path.join(local_dir, tags_filename)
-        else:
-            tags_file = os.path.join(local_dir, tag_type, "%s.yml" % tag)
-        with open(tags_file, 'rb') as infile:
-            yaml = YAML(typ='rt')
-            tags_info = yaml.load(infile)
-        # if packages section is empty we can't iterate.
-        if tags_info['packages']:
-            for pkg in tags_info['packages']:
-                if pkg['project'] == project:
-                    if isinstance(pkg[tag_type][tag], dict):
-                        pkg[tag_type][tag].update(package[tag_type][tag])
-                    else:
-                        pkg[tag_type][tag] = package[tag_type][tag]
-                    updated = True
-        else:
-            tags_info['packages'] = []
-        # If the package does not exist in the release file, we have to
-        # add it.
-        if not updated:
-            newpkg = {}
-            newpkg['project'] = project
-            newpkg[tag_type] = {tag: package[tag_type][tag]}
-            tags_info['packages'].append(newpkg)
-        tags_info['packages'].sort(key=lambda i: i['project'])
-        with open(tags_file, 'w') as outfile:
-            yaml.dump(tags_info, stream=outfile)
+    packages = {}
+    # original content and parsed data, indexed by tags file path
+    tags_files = {}
+    for tag_type, project, tag_key, tag_value in changes:
+        if project not in packages:
+            # parsed rdoinfo is shared, don't modify it in place
+            packages[project] = copy.deepcopy(get_project(
+                project, info_files=info_files, local_dir=local_dir))
+        package = packages[project]
+        if tag_type not in package.keys():
+            package[tag_type] = {}
+        package[tag_type][tag_key] = tag_value
+        # We update all tags for a given package to make sure we override
+        # properly the default tags from package configs the first time
+        # we update tags.
+        for tag in package[tag_type].keys():
+            if not update_all_files:
+                if tag != tag_key:
+                    continue
+            updated = False
+            if tags_filename:
+                tags_file = os.path.join(local_dir, tags_filename)
+            else:
+                tags_file = os.path.join(local_dir, tag_type, "%s.yml" % tag)
+            if tags_file not in tags_files:
+                with open(tags_file, 'rb') as infile:
+                    content = infile.read().decode('utf-8')
+                tags_files[tags_file] = (content,
+                                         yaml_utils.load_rt(content))
+            tags_info = tags_files[tags_file][1]
+            # if packages section is empty we can't iterate.
+            if tags_info['packages']:
+                for pkg in tags_info['packages']:
+                    if pkg['project'] == project:
+                        if isinstance(pkg[tag_type][tag], dict):
+                            pkg[tag_type][tag].update(package[tag_type][tag])
+                        else:
+                            pkg[tag_type][tag] = package[tag_type][tag]
+                        updated = True
+            else:
+                tags_info['packages'] = []
+            # If the package does not exist in the release file, we have to
+            # add it.
+            if not updated:
+                newpkg = {}
+                newpkg['project'] = project
+                newpkg[tag_type] = {tag: package[tag_type][tag]}
+                tags_info['packages'].append(newpkg)
+            tags_info['packages'].sort(key=lambda i: i['project'])
+
+    diff = []
+    new_contents = []
+    for tags_file in sorted(tags_files.keys()):
+        content, tags_info = tags_files[tags_file]
+        stream = io.StringIO()
+        yaml_utils.dump_rt(tags_info, stream)
+        new_content = stream.getvalue()
+        if new_content == content:
+            continue
+        rel_path = os.path.relpath(tags_file, local_dir)
+        diff.extend(difflib.unified_diff(content.splitlines(True),
+                                         new_content.splitlines(True),
+                                         fromfile='a/%s' % rel_path,
+                                         tofile='b/%s' % rel_path))
+        new_contents.append((tags_file, new_content))
+    if not dry_run:
+        written = []
+        try:
+            for tags_file, new_content in new_contents:
+                cache_utils.atomic_write(tags_file,
+                                         new_content.encode('utf-8'))
+                written.append(tags_file)
+        except Exception:
+            for tags_file in written:
+                cache_utils.atomic_write(
+                    tags_file, tags_files[tags_file][0].encode('utf-8'))
+            raise
+    return ''.join(diff)
 
 
 def get_projects_distgit(tag=None, buildsys_tag=None):
@@ -141,14 +471,10 @@ def get_projects_distgit(tag=None, buildsys_tag=None):
 
 
 def get_pin(package, release, local_dir=local_info):
-    distroinfo = info.DistroInfo(
-        info_files='rdo.yml',
-        local_info=local_dir)
-    inforepo = distroinfo.get_info()
-    pkgs = [p for p in inforepo['packages'] if p['name'] == package]
-    if not pkgs or len(pkgs) != 1:
+    index = get_index(info_files='rdo.yml', local_dir=local_dir)
+    pkg = index.get_by_name(package)
+    if pkg is None:
         raise NotInRdoinfo("Package %s not found in rdoinfo" % package)
-    pkg = pkgs[0]
     if release in pkg['tags'].keys():
         pkg_rel_tag = pkg['tags'][release]
         if pkg_rel_tag and 'source-branch' in pkg_rel_tag.keys():
@@ -160,15 +486,38 @@ def get_pin(package, release, local_dir=local_info):
                                   (package, release))
 
 
-def get_new_pinned_builds(location, release):
-    new_pins = []
+def get_new_pinned_builds(location, release, revisions=None):
+    """ Return packages with a new source-branch pin for release.
+
+    By default, the pins in the last commit of the rdoinfo checkout in
+    location are compared with its parent. If revisions is specified, it
+    must be a git revision range as 'OLD..NEW', 'OLD...NEW' or a single
+    revision (same as 'REV~..REV'), and only the tags files modified in
+    that range are parsed (see get_new_pinned_builds_range).
+    """
+    if revisions is not None:
+        return get_new_pinned_builds_range(location, release, revisions)
+    from distroinfo import info
+    from rdopkg import helpers
+    from rdopkg.utils import git
+
+    info2 = get_info(info_files='rdo.yml', local_dir=location)
     distroinfo = info.DistroInfo(
         info_files='rdo.yml',
         local_info=location)
-    info2 = distroinfo.get_info()
     with helpers.cdir(location):
         with git.git_revision('HEAD~'):
             info1 = distroinfo.get_info()
+    return _get_new_pins(info1, info2, release)
+
+
+def _get_new_pins(info1, info2, release):
+    """ Return the new source-branch pins for release between two parsed
+    rdoinfo.
+    """
+    from distroinfo import query
+
+    new_pins = []
     packages = query.tags_diff(info1, info2, tagsname='tags')
     for package in packages:
         name = package[0]
@@ -184,6 +533,81 @@ def get_new_pinned_builds(location, release):
     return new_pins
 
 
+def _split_revisions(location, revisions):
+    """ Return the old and new revisions of a range, compared as git diff
+    does.
+    """
+    if '...' in revisions:
+        old_rev, new_rev = revisions.split('...', 1)
+        old_rev, new_rev = old_rev or 'HEAD', new_rev or 'HEAD'
+        # changes on new_rev since it forked from old_rev
+        old_rev = subprocess.check_output(
+            ['git', '-C', location, 'merge-base', old_rev, new_rev],
+            universal_newlines=True).strip()
+        return old_rev, new_rev
+    if '..' in revisions:
+        old_rev, new_rev = revisions.split('..', 1)
+        return old_rev or 'HEAD', new_rev or 'HEAD'
+    return '%s~' % revisions, revisions
+
+
+def get_changed_tags_files(location, old_rev, new_rev):
+    """ Return the tags files modified between two revisions of rdoinfo """
+    output = subprocess.check_output(
+        ['git', '-C', location, 'diff', '--name-only', '--no-renames',
+         old_rev, new_rev, '--', 'tags/'])
+    return [f for f in output.decode().splitlines() if f.endswith('.yml')]
+
+
+def _get_revision_info(location, revision, tags_files,
+                       info_files='rdo.yml'):
+    """ Return rdoinfo parsed from a git revision of the checkout in
+    location, without checking it out, importing only tags_files among the
+    tags files.
+    """
+    from distroinfo import fetch
+    from distroinfo import info
+
+    class RevisionInfoFetcher(fetch.InfoFetcher):
+        def get_file_content(self, fn):
+            return subprocess.check_output(
+                ['git', '-C', self.source, 'show', '%s:%s' % (revision, fn)],
+                universal_newlines=True)
+
+        def get_file_data(self, fn):
+            data = super(RevisionInfoFetcher, self).get_file_data(fn)
+            if data and data.get('import'):
+                data['import'] = [
+                    ifn for ifn in data['import']
+                    if not isinstance(ifn, str) or
+                    not ifn.startswith('tags/') or ifn in tags_files]
+            return data
+
+    distroinfo = info.DistroInfo(
+        info_files=info_files,
+        fetcher=RevisionInfoFetcher(location))
+    return distroinfo.get_info()
+
+
+def get_new_pinned_builds_range(location, release, revisions):
+    """ Incremental version of get_new_pinned_builds.
+
+    Both revisions of the range are read from git, without checking out
+    any of them, and parsed as get_new_pinned_builds does, package configs
+    included, but with only the tags files modified in the range. The pins
+    are then compared the same way, so a range covering several merged
+    commits is processed in one run. Tags of a package set in a tags file
+    not modified in the range are not seen.
+    """
+    old_rev, new_rev = _split_revisions(location, revisions)
+    tags_files = get_changed_tags_files(location, old_rev, new_rev)
+    if not tags_files:
+        return []
+    info1 = _get_revision_info(location, old_rev, tags_files)
+    info2 = _get_revision_info(location, new_rev, tags_files)
+    return _get_new_pins(info1, info2, release)
+
+
 class NotInRdoinfo(Exception):
     pass
 
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import threading
+
+from rdoutils import cache_utils
+
+RELEASES_GIT_URL = 'https://opendev.org/openstack/releases'
+
+
+def get_default_repo_path():
+    return cache_utils.get_cache_path('releases.git')
+
+
+class ReleasesRepo(object):
+    """ Local bare clone of openstack/releases used to read deliverable
+    files at any commit without downloading them.
+
+    Files are read through a single long running git cat-file --batch
+    process. Commits missing in the clone are fetched on demand by fetch().
+    """
+
+    def __init__(self, path=None, url=RELEASES_GIT_URL):
+        self.path = path or get_default_repo_path()
+        self.url = url
+        self.lock = threading.Lock()
+        self._cat_file = None
+        if not os.path.exists(os.path.join(self.path, 'HEAD')):
+            subprocess.check_call(['git', 'clone', '--quiet', '--bare',
+                                   self.url, self.path])
+
+    def git(self, *args, **kwargs):
+        return subprocess.check_output(['git', '-C', self.path] + list(args),
+                                       universal_newlines=True, **kwargs)
+
+    def has_commit(self, commit):
+        try:
+            self.git('cat-file', '-e', '%s^{commit}' % commit,
+                     stderr=subprocess.DEVNULL)
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    def fetch_branches(self):
+        self.git('fetch', '--quiet', '--prune', self.url,
+                 '+refs/heads/*:refs/heads/*')
+
+    def fetch(self, *commits):
+        """ Make sure commits are available in the local clone.
+
+        Branches are fetched first, commits still missing (as unmerged
+        revisions) are then fetched by id.
+        """
+        missing = [c for c in commits if not self.has_commit(c)]
+        if not missing:
+            return
+        self.fetch_branches()
+        missing = [c for c in missing if not self.has_commit(c)]
+        if missing:
+            self.git('fetch', '--quiet', self.url, *missing)
+
+    def _get_cat_file(self):
+        if self._cat_file is None or self._cat_file.poll() is not None:
+            self._cat_file = subprocess.Popen(
+                ['git', '-C', self.path, 'cat-file', '--batch'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._cat_file
+
+    def read_blob(self, commit, path):
+        """ Return (blob id, content) of path at commit, or (None, None)
+        if it does not exist.
+        """
+        with self.lock:
+            cat_file = self._get_cat_file()
+            cat_file.stdin.write(("%s:%s\n" % (commit, path)).encode('utf-8'))
+            cat_file.stdin.flush()
+            header = cat_file.stdout.readline().decode('utf-8').split()
+            if len(header) != 3:
+                # "<object> missing" or "ambiguous", no content follows
+                return None, None
+            size = int(header[2])
+            content = cat_file.stdout.read(size)
+            # content is followed by a newline
+            cat_file.stdout.read(1)
+        if header[1] != 'blob':
+            # a tree or a submodule commit, its content was skipped
+            return None, None
+        return header[0], content.decode('utf-8')
+
+    def read_file(self, commit, path):
+        """ Return the content of path at commit, or None """
+        return self.read_blob(commit, path)[1]
+
+    def close(self):
+        if self._cat_file is not None:
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file = None
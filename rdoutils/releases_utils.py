@@ -1,32 +1,132 @@
+import hashlib
 import json
 import re
-import requests
-import yaml
+import threading
+from concurrent import futures
 
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from rdoutils import cache_utils
+from rdoutils import http_cache
+from rdoutils import releases_repo
+from rdoutils import yaml_utils
+
+RELEASES_RAW_URL = ("https://opendev.org/openstack/releases/raw/commit/%s/"
+                    "%s")
+
+# Files downloaded concurrently by get_new_releases_review
+FETCH_WORKERS = 8
+
+RE_RELEASE = re.compile('deliverables/(.*)/.*')
+RE_EXCLUDES = re.compile('.*-(eol|em)$')
+
+_session = None
+_session_lock = threading.Lock()
+_release_memo = cache_utils.Shared(
+    lambda: cache_utils.MemoStore('release-info'))
+
+# Local clone of openstack/releases to read the deliverable files from
+# instead of downloading them, see use_releases_repo
+_releases_repo = None
+
+
+def use_releases_repo(path=None):
+    """ Read deliverable files from a local clone of openstack/releases
+    in path (created if needed) instead of downloading them from opendev.
+    """
+    global _releases_repo
+    _releases_repo = releases_repo.ReleasesRepo(path)
+    return _releases_repo
+
+
+def get_session():
+    """ Return the requests session with retries shared by all the
+    downloads of release files.
+    """
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3.util.retry import Retry
+
+    with _session_lock:
+        if _session is None:
+            retry_strategy = Retry(
+                total=3,
+                status_forcelist=[404, 429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+                backoff_factor=2,
+            )
+            adapter = HTTPAdapter(max_retries=retry_strategy,
+                                  pool_maxsize=FETCH_WORKERS)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
 
 
 def get_release_file(commit, path):
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=[404, 429, 500, 502, 503, 504],
-        method_whitelist=["GET"],
-        backoff_factor=2,
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-    http.mount("http://", adapter)
-    url = ("https://opendev.org/openstack/releases/raw/commit/%s/%s" %
-           (commit, path))
-    release = http.get(url)
+    url = RELEASES_RAW_URL % (commit, path)
+    release = http_cache.get(url, session=get_session())
     if release.status_code == 200:
         return release.text
 
 
-def get_release_info(release_content):
-    deliverable = yaml.safe_load(release_content)
+def get_blob_id(content):
+    """ Return the git blob id of content, used as key of the memo """
+    data = content.encode('utf-8')
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_release_memo():
+    return _release_memo.get()
+
+
+def _load_last_release(release_content):
+    """ Load a deliverable keeping only the team and the last entry of
+    releases, which is all get_release_info needs. Only the lines of that
+    entry are parsed. Returns None if the layout of the file is not the
+    expected one, so the whole file must be parsed.
+    """
+    lines = release_content.splitlines()
+    try:
+        start = lines.index('releases:')
+    except ValueError:
+        return None
+    team = None
+    for line in lines:
+        if line.startswith('team:'):
+            team = yaml_utils.load(line)['team']
+            break
+    # entries of releases go until the next top level key
+    end = len(lines)
+    item_start = None
+    item_prefix = None
+    for i in range(start + 1, len(lines)):
+        line = lines[i]
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if item_prefix is None:
+            item_prefix = line[:len(line) - len(line.lstrip())] + '- '
+        if line.startswith(item_prefix):
+            item_start = i
+        elif not line[0].isspace() and not line.startswith('-'):
+            end = i
+            break
+    if item_start is None:
+        return None
+    last_release = yaml_utils.load("\n".join(lines[item_start:end]))
+    if (not isinstance(last_release, list) or len(last_release) != 1 or
+            not isinstance(last_release[0], dict) or
+            'version' not in last_release[0]):
+        return None
+    deliverable = {'releases': last_release}
+    if team is not None:
+        deliverable['team'] = team
+    return deliverable
+
+
+def _parse_release_info(release_content):
+    deliverable = _load_last_release(release_content)
+    if deliverable is None:
+        deliverable = yaml_utils.load(release_content)
     if 'releases' not in deliverable.keys():
         return None
     releases = deliverable['releases']
@@ -43,40 +143,73 @@ def get_release_info(release_content):
     return release
 
 
+def get_release_info(release_content, memo=True):
+    """ Return the name, version and repos of the last release in the
+    content of a deliverable file, or None.
+
+    Results are memoized by git blob id of the content, so each version of
+    a deliverable is only parsed once.
+    """
+    if not memo:
+        return _parse_release_info(release_content)
+    release_memo = get_release_memo()
+    blob_id = get_blob_id(release_content)
+    release = release_memo.get(blob_id, default=KeyError)
+    if release is KeyError:
+        release = _parse_release_info(release_content)
+        release_memo.set(blob_id, release)
+    return release
+
+
+def _fetch_release_info(get_file, commit, path):
+    content = get_file(commit, path)
+    if content is None:
+        return None, None
+    return content, get_release_info(content)
+
+
 def get_new_releases_review(review):
     new_releases = []
     cur_rev = review['current_revision']
     cur_rev_info = review['revisions'][cur_rev]
     parent_rev = cur_rev_info['commit']['parents'][0]['commit']
     files = cur_rev_info['files']
-    for mod_file in files.keys():
-        re_release = re.compile('deliverables/(.*)/.*')
-        release = re.search(re_release, mod_file).group(1)
-        file_def = files[mod_file]
-        if 'status' in file_def.keys() and file_def['status'] == 'D':
-            continue
-        new_release_f = get_release_file(cur_rev, mod_file)
-        new_release = get_release_info(new_release_f)
-        if not new_release:
-            continue
-        re_excludes = re.compile('.*-(eol|em)$')
-        if re.search(re_excludes, new_release['version']):
-            continue
-        new_release['release'] = release
-        parent_release_f = get_release_file(parent_rev, mod_file)
-        if parent_release_f is None:
-            new_releases.append(new_release)
-        else:
-            parent_release = get_release_info(parent_release_f)
-            if parent_release is None:
+    if _releases_repo:
+        _releases_repo.fetch(cur_rev, parent_rev)
+        get_file = _releases_repo.read_file
+    else:
+        get_file = get_release_file
+    mod_files = [f for f in files.keys()
+                 if files[f].get('status') != 'D']
+    # Both versions of all the modified files are fetched and parsed
+    # concurrently, results are then processed in the review order.
+    with futures.ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        new_infos = [executor.submit(_fetch_release_info, get_file, cur_rev,
+                                     mod_file)
+                     for mod_file in mod_files]
+        parent_infos = [executor.submit(_fetch_release_info, get_file,
+                                        parent_rev, mod_file)
+                        for mod_file in mod_files]
+        for mod_file, new_info, parent_info in zip(mod_files, new_infos,
+                                                   parent_infos):
+            release = RE_RELEASE.search(mod_file).group(1)
+            new_release = new_info.result()[1]
+            if not new_release:
+                continue
+            if RE_EXCLUDES.search(new_release['version']):
+                continue
+            new_release['release'] = release
+            parent_release_f, parent_release = parent_info.result()
+            if parent_release_f is None or parent_release is None:
+                new_releases.append(new_release)
+            elif new_release['version'] != parent_release['version']:
                 new_releases.append(new_release)
-            else:
-                if new_release['version'] != parent_release['version']:
-                    new_releases.append(new_release)
     return new_releases
 
 
 def refined_get(url, user, password):
+    import requests
+
     result = requests.get(url, auth=(user, password))
     if result.status_code == 200:
         result_json = json.loads(result.text)
@@ -85,7 +218,25 @@ def refined_get(url, user, password):
         return None
 
 
-def get_files_release(release, user, password, only_branched=False):
+def get_files_release(release, user=None, password=None,
+                      only_branched=False, catalog=None):
+    """ Return the names of the deliverable files of release.
+
+    Without GitHub credentials, they are looked up in a local deliverables
+    catalog (see rdoutils.deliverables), updated before the lookup.
+    Otherwise the GitHub code search API is used and None is returned if
+    any page of results can not be retrieved.
+    """
+    if user is None:
+        from rdoutils import deliverables
+
+        if catalog is None:
+            catalog = deliverables.DeliverablesCatalog()
+        catalog.update()
+        stable_branch = True if only_branched else None
+        return ["%s.yaml" % d['name'] for d in
+                catalog.list_deliverables(release,
+                                          stable_branch=stable_branch)]
     if only_branched:
         base_url = ("https://api.github.com/search/code?q=stable/%spath"
                     ":deliverables/%s+repo:openstack/releases" %
@@ -100,7 +251,13 @@ def get_files_release(release, user, password, only_branched=False):
         while len(files) < result['total_count']:
             url = "%s&page=%s" % (base_url, page)
             result_page = refined_get(url, user, password)
-            files_page = [item['name'] for item in result_page['items']]
-            files = files + files_page
+            if result_page is None:
+                # retry once before giving up
+                result_page = refined_get(url, user, password)
+            if result_page is None:
+                return None
+            if not result_page['items']:
+                break
+            files.extend(item['name'] for item in result_page['items'])
             page += 1
         return files
@@ -1,7 +1,8 @@
 import sys
-from ruamel.yaml import YAML
 from os.path import exists
 
+from rdoutils import yaml_utils
+
 all_resources = {}
 
 
@@ -17,10 +18,10 @@ def load_resource(local_config, resource):
 
     resource_file_path = get_resource_file_path(local_config, resource)
     try:
+        # resources are only loaded to be updated and written back
         with open(resource_file_path, 'rb') as infile:
-            yaml = YAML()
-            yaml.preserve_quotes = True
-            all_resources[resource] = yaml.load(infile)
+            all_resources[resource] = yaml_utils.load_rt(
+                infile, preserve_quotes=True)
     except IOError:
         print("The file {} does not exist. "
               "Exiting...".format(resource_file_path))
@@ -38,8 +39,7 @@ def get_repo_data(resource, repo_name):
 def write_resource_file(local_config, resource, data):
     resource_file_path = get_resource_file_path(local_config, resource)
     with open(resource_file_path, 'w') as outfile:
-        yaml = YAML()
-        yaml.dump(data, stream=outfile)
+        yaml_utils.dump_rt(data, outfile)
 
 
 def write_resources(local_config):
@@ -1,13 +1,6 @@
-
-import requests
-import validators
-
-from pygerrit2 import GerritRestAPI
-from requests.auth import HTTPBasicAuth
-
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+import re
+import threading
+from concurrent import futures
 
 GERRIT_URLS = {
     'rdo': 'https://review.rdoproject.org/r',
@@ -15,10 +8,62 @@ GERRIT_URLS = {
     'osp': 'https://review.openstack.org/',
 }
 
-QUERY_PARMS = "&o=CURRENT_REVISION&o=ALL_FILES&o=CURRENT_COMMIT"
+# Options requested by default for changes in openstack/releases
+REVIEW_OPTIONS = ['CURRENT_REVISION', 'ALL_FILES', 'CURRENT_COMMIT']
+QUERY_PARMS = ''.join("&o=%s" % option for option in REVIEW_OPTIONS)
+
+# Results per page in paginated queries
+PAGE_SIZE = 200
+
+# Maximum length of the query of batched requests, to stay under the URL
+# length limits of Gerrit and the proxies in front of it
+MAX_QUERY_LENGTH = 2000
+
+
+# Gerrit clients shared by the whole process, indexed by (url, user)
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Connection pools of the shared clients sessions
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+
+def _disable_insecure_warnings():
+    import requests
+    from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+    requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+
+def _new_gerrit_client(gerrit_url, user=None, password=None):
+    from pygerrit2 import GerritRestAPI
+    from requests.adapters import HTTPAdapter
+    from requests.auth import HTTPBasicAuth
+
+    _disable_insecure_warnings()
+    if user and password:
+        client = GerritRestAPI(url=gerrit_url,
+                               auth=HTTPBasicAuth(user, password),
+                               verify=False)
+    else:
+        client = GerritRestAPI(url=gerrit_url, verify=False)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                          pool_maxsize=POOL_MAXSIZE)
+    client.session.mount('https://', adapter)
+    client.session.mount('http://', adapter)
+    return client
 
 
-def get_gerrit_client(url, user=None, password=None):
+def get_gerrit_client(url, user=None, password=None, shared=True):
+    """ Return a Gerrit client for url, a key in GERRIT_URLS or a full URL.
+
+    Clients are shared by all the callers in the process using the same url
+    and user, so connections are kept alive between queries. Use
+    shared=False to get a new client.
+    """
+    import validators
+
     if url in GERRIT_URLS.keys():
         gerrit_url = GERRIT_URLS[url]
     elif validators.url(url):
@@ -26,50 +71,189 @@ def get_gerrit_client(url, user=None, password=None):
     else:
         msg = "The provided url is not valid."
         return ValueError(msg)
-    if user and password:
-        return GerritRestAPI(url=gerrit_url,
-                             auth=HTTPBasicAuth(user, password),
-                             verify=False)
-    else:
-        return GerritRestAPI(url=gerrit_url, verify=False)
+    if not shared:
+        return _new_gerrit_client(gerrit_url, user=user, password=password)
+    key = (gerrit_url, user if password else None)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _new_gerrit_client(gerrit_url, user=user,
+                                        password=password)
+            _clients[key] = client
+    return client
+
+
+def _iter_pages(fetch_page):
+    """ Yield the pages returned by fetch_page(start) until it returns
+    (page, False). The next page is fetched in a background thread while the
+    current one is consumed, so at most two pages are held in memory.
+    """
+    executor = futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(fetch_page, 0)
+        start = 0
+        while future:
+            page, more = future.result()
+            start += len(page)
+            future = None
+            if more and page:
+                future = executor.submit(fetch_page, start)
+            yield page
+    finally:
+        executor.shutdown(wait=False)
+
+
+def iter_changes(client, query, options=None, page_size=PAGE_SIZE):
+    """ Iterate over all the changes matching query, following Gerrit's
+    _more_changes flag with S= offsets.
+
+    options is a list of o= parameters, as ['CURRENT_REVISION'], to request
+    only the fields the caller needs.
+    """
+    url = "/changes/?q=%s&n=%s" % (query, page_size)
+    for option in options or []:
+        url = "%s&o=%s" % (url, option)
+
+    def fetch_page(start):
+        changes = client.get("%s&S=%s" % (url, start))
+        more = bool(changes and changes[-1].get('_more_changes'))
+        return changes, more
+
+    seen = set()
+    for changes in _iter_pages(fetch_page):
+        for change in changes:
+            # Offsets may shift if changes are updated while paginating
+            if change['_number'] in seen:
+                continue
+            seen.add(change['_number'])
+            yield change
+
+
+def iter_projects(client, query, page_size=PAGE_SIZE):
+    """ Iterate over (name, info) of the projects returned by
+    /projects/?<query>, paginated with n= and S=.
+    """
+    url = "/projects/?%s&n=%s" % (query, page_size)
+
+    def fetch_page(start):
+        projects = client.get("%s&S=%s" % (url, start))
+        items = list(projects.items())
+        more = len(items) >= page_size or bool(
+            items and items[-1][1].get('_more_projects'))
+        return items, more
+
+    for projects in _iter_pages(fetch_page):
+        for project in projects:
+            yield project
+
+
+def _osp_releases_query(release, number=None, after=None, status='merged'):
+    query = ""
+    if number:
+        query = "%s%s+" % (query, number)
+    if status:
+        query = "%sstatus:%s+" % (query, status)
+    if after:
+        query = "%safter:%s+" % (query, after)
+    return ("%sproject:openstack/releases+file:deliverables+file:%s" %
+            (query, release))
+
+
+def iter_osp_releases_reviews(release,
+                              number=None,
+                              after=None,
+                              status='merged',
+                              options=REVIEW_OPTIONS):
+    client = get_gerrit_client('osp')
+    query = _osp_releases_query(release, number=number, after=after,
+                                status=status)
+    return iter_changes(client, query, options=options)
 
 
 def get_osp_releases_reviews(release,
                              number=None,
                              after=None,
                              status='merged'):
-    client = get_gerrit_client('osp')
-    rev_url = "/changes/?q="
-    if number:
-        rev_url = "%s%s+" % (rev_url, number)
-    if status:
-        rev_url = "%sstatus:%s+" % (rev_url, status)
-    if after:
-        rev_url = "%safter:%s+" % (rev_url, after)
-    rev_url = ("%sproject:openstack/releases+file:deliverables+file:%s%s" %
-               (rev_url, release, QUERY_PARMS))
-    reviews = client.get(rev_url)
-    return (reviews)
+    return list(iter_osp_releases_reviews(release, number=number,
+                                          after=after, status=status))
 
 
 def get_review(review):
     client = get_gerrit_client('osp')
-    review = client.get("/changes/?q=%s%s" % (review, QUERY_PARMS))
-    return (review)
+    return list(iter_changes(client, review, options=REVIEW_OPTIONS))
 
 
-def get_reviews_project(client, project, **kwargs):
-    url = "/changes/?q=project:\"^.*%s.*\"" % project
+def _project_term(project):
+    return "project:\"^.*%s.*\"" % project
+
+
+def _filters_query(**kwargs):
+    query = ""
     for key, value in kwargs.items():
         if value:
-            url = "%s+%s:%s" % (url, key, value)
-    return client.get(url)
+            query = "%s+%s:%s" % (query, key, value)
+    return query
 
 
-def get_rdo_projects(client, **kwargs):
-    url = '/projects/?r=(puppet|openstack)%2F.*distgit'
+def _reviews_project_query(project, **kwargs):
+    return _project_term(project) + _filters_query(**kwargs)
+
+
+def project_matches(project, name):
+    """ Return True if the project name is matched by the project search
+    term used in get_reviews_project.
+    """
+    return re.match("^.*%s.*$" % project, name) is not None
+
+
+def _chunk_terms(terms, max_length):
+    chunk = []
+    length = 0
+    for term in terms:
+        if chunk and length + len(term) > max_length:
+            yield chunk
+            chunk = []
+            length = 0
+        chunk.append(term)
+        length += len(term) + len("+OR+")
+    if chunk:
+        yield chunk
+
+
+def iter_reviews_project(client, project, options=None, **kwargs):
+    return iter_changes(client, _reviews_project_query(project, **kwargs),
+                        options=options)
+
+
+def iter_reviews_projects(client, projects, options=None,
+                          max_length=MAX_QUERY_LENGTH, **kwargs):
+    """ Iterate over the reviews of several projects, with the same search
+    terms as get_reviews_project.
+
+    Projects are OR-combined in queries as
+    (project:A OR project:B) status:open, split in as many queries as
+    needed to keep each of them under max_length. Use project_matches to
+    find the projects each review belongs to.
+    """
+    filters = _filters_query(**kwargs)
+    terms = [_project_term(project) for project in projects]
+    for chunk in _chunk_terms(terms, max_length - len(filters)):
+        query = "(%s)%s" % ("+OR+".join(chunk), filters)
+        for change in iter_changes(client, query, options=options):
+            yield change
+
+
+def get_reviews_project(client, project, **kwargs):
+    return list(iter_reviews_project(client, project, **kwargs))
+
+
+def iter_rdo_projects(client, **kwargs):
+    query = 'r=(puppet|openstack)%2F.*distgit'
     for key, value in kwargs.items():
         if value:
-            url = "%s&%s=%s" % (url, key, value)
-    projects = client.get(url)
-    return projects
+            query = "%s&%s=%s" % (query, key, value)
+    return iter_projects(client, query)
+
+
+def get_rdo_projects(client, **kwargs):
+    return dict(iter_rdo_projects(client, **kwargs))
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import subprocess
+import threading
+
+from rdoutils import cache_utils
+
+# Version of the cached information, bump it on incompatible changes
+SPEC_INFO_VERSION = 1
+
+RE_GPG_MACRO = re.compile(r'^%(?:global|define)\s+(sources_gpg\w*)\s+(\S+)',
+                          re.MULTILINE)
+
+# rpm keeps global state while parsing specs
+rpm_lock = threading.Lock()
+
+_spec_memo = cache_utils.Shared(lambda: cache_utils.MemoStore('spec-info'))
+_dist = None
+
+
+def get_spec_memo():
+    return _spec_memo.get()
+
+
+def get_dist():
+    """ Return the value of the dist macro on this host, which is part of
+    the release of most specs.
+    """
+    global _dist
+    import rpm
+
+    with rpm_lock:
+        if _dist is None:
+            _dist = rpm.expandMacro('%{?dist}')
+    return _dist
+
+
+def get_commit(pkg_dir):
+    """ Return the commit checked out in pkg_dir, or None """
+    try:
+        return subprocess.check_output(
+            ['git', '-C', pkg_dir, 'rev-parse', 'HEAD'],
+            universal_newlines=True, stderr=subprocess.DEVNULL).strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def parse_spec(spec_file, content=None):
+    """ Return the metadata of a spec: epoch, version, release, the urls
+    of its sources as [number, url] and its gpg signature macros.
+    """
+    import rpm
+
+    if content is None:
+        with open(spec_file) as f:
+            content = f.read()
+    with rpm_lock:
+        tran = rpm.TransactionSet()
+        spec = tran.parseSpec(spec_file)
+        hdr = spec.packages[0].header
+        info = {'epoch': hdr.format('%{epoch}'),
+                'version': hdr.format('%{version}'),
+                'release': hdr.format('%{release}'),
+                'sources': sorted([number, source] for source, number, flags
+                                  in spec.sources
+                                  if flags & rpm.RPMBUILD_ISSOURCE)}
+    info['gpg_macros'] = dict(RE_GPG_MACRO.findall(content))
+    return info
+
+
+def get_spec_info(pkg_dir, package, commit=None, memo=True):
+    """ Return the metadata of the spec of package in its distgit checkout
+    pkg_dir, as parse_spec does.
+
+    Results are memoized by package, distgit commit (the commit checked out
+    in pkg_dir by default), spec content hash and dist macro, so a spec is
+    only parsed once for all the runs.
+    """
+    spec_file = os.path.join(pkg_dir, '%s.spec' % package)
+    with open(spec_file, 'rb') as f:
+        content = f.read()
+    if not memo:
+        return parse_spec(spec_file, content.decode('utf-8'))
+    if commit is None:
+        commit = get_commit(pkg_dir)
+    key = "%s:%s:%s:%s:%s" % (SPEC_INFO_VERSION, package, commit,
+                              hashlib.sha256(content).hexdigest(), get_dist())
+    spec_memo = get_spec_memo()
+    info = spec_memo.get(key)
+    if info is None:
+        info = parse_spec(spec_file, content.decode('utf-8'))
+        spec_memo.set(key, info)
+    return info
+
+
+def get_evr(info):
+    """ Return (epoch, version, release) from spec metadata """
+    return (info['epoch'], info['version'], info['release'])
+
+
+def get_source_url(info, number=0):
+    """ Return the url of source number from spec metadata, or None """
+    for source_number, source in info['sources']:
+        if source_number == number:
+            return source
+    return None
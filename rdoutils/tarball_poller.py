@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent import futures
+
+# Default delays of the checks of an url, in seconds. The delay doubles
+# after each failed check up to MAX_WAIT, urls are given up after TIMEOUT.
+INITIAL_WAIT = 10
+MAX_WAIT = 120
+TIMEOUT = 20 * 60
+CHECK_WORKERS = 8
+REQUEST_TIMEOUT = 30
+
+
+class TarballPoller(object):
+    """ Wait concurrently for files, as release tarballs, to be published.
+
+    watch(url) returns a future resolved to True as soon as a HEAD request
+    to url succeeds, or to False when it still fails after timeout seconds.
+    Checks are retried with exponential backoff, a single thread schedules
+    them and a pool of threads runs the requests. Usage example:
+
+        poller = TarballPoller()
+        ready = poller.watch('https://tarballs.opendev.org/.../x.tar.gz')
+        ready.add_done_callback(send_review)
+        ...
+        poller.close()
+    """
+
+    def __init__(self, session=None, initial_wait=INITIAL_WAIT,
+                 max_wait=MAX_WAIT, timeout=TIMEOUT, workers=CHECK_WORKERS):
+        self._session = session
+        self._session_lock = threading.Lock()
+        self.workers = workers
+        self.initial_wait = initial_wait
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.executor = futures.ThreadPoolExecutor(max_workers=workers)
+        self.condition = threading.Condition()
+        # (time of the next check, sequence, url, attempt, deadline)
+        self.queue = []
+        self.counter = itertools.count()
+        self.watched = {}
+        self.closed = False
+        self.scheduler = threading.Thread(target=self._schedule)
+        self.scheduler.daemon = True
+        self.scheduler.start()
+
+    @property
+    def session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._session_lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self.workers)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+        return self._session
+
+    def watch(self, url):
+        """ Return a future resolved to True when url exists, or False on
+        timeout. Urls already watched share the same future.
+        """
+        with self.condition:
+            future = self.watched.get(url)
+            # urls given up are watched again
+            if future is None or (future.done() and not future.result()):
+                future = self.watched[url] = futures.Future()
+                self._push(time.time(), url, 0,
+                           time.time() + self.timeout)
+            return future
+
+    def _push(self, when, url, attempt, deadline):
+        heapq.heappush(self.queue, (when, next(self.counter), url, attempt,
+                                    deadline))
+        self.condition.notify()
+
+    def _schedule(self):
+        with self.condition:
+            while not self.closed:
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+                delay = self.queue[0][0] - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                _, _, url, attempt, deadline = heapq.heappop(self.queue)
+                self.executor.submit(self._check, url, attempt, deadline)
+
+    def exists(self, url):
+        try:
+            response = self.session.head(url, allow_redirects=True,
+                                         timeout=REQUEST_TIMEOUT)
+            if response.status_code == 405:
+                # HEAD not allowed, only download the headers
+                response = self.session.get(url, stream=True,
+                                            timeout=REQUEST_TIMEOUT)
+                response.close()
+        except Exception:
+            return False
+        return response.status_code == 200
+
+    def _check(self, url, attempt, deadline):
+        if self.exists(url):
+            self.watched[url].set_result(True)
+            return
+        wait = min(self.initial_wait * 2 ** attempt, self.max_wait)
+        if time.time() + wait > deadline:
+            self.watched[url].set_result(False)
+            return
+        with self.condition:
+            self._push(time.time() + wait, url, attempt + 1, deadline)
+
+    def close(self):
+        """ Stop checking, the urls still watched are resolved to False """
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+            self.queue = []
+        self.scheduler.join()
+        self.executor.shutdown(wait=True)
+        for future in self.watched.values():
+            if not future.done():
+                future.set_result(False)
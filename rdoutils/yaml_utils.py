@@ -0,0 +1,36 @@
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+def load(stream):
+    """ Load YAML for read-only use with the fastest safe loader available.
+
+    libyaml's CSafeLoader is used when PyYAML is built with it. Comments,
+    ordering and quoting are not preserved, use load_rt for files that are
+    going to be rewritten.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def get_rt_yaml(preserve_quotes=False):
+    from ruamel.yaml import YAML
+
+    yaml_rt = YAML(typ='rt')
+    yaml_rt.preserve_quotes = preserve_quotes
+    return yaml_rt
+
+
+def load_rt(stream, preserve_quotes=False):
+    """ Load YAML with ruamel's round-trip loader so it can be written back
+    with dump_rt keeping comments and formatting.
+    """
+    return get_rt_yaml(preserve_quotes=preserve_quotes).load(stream)
+
+
+def dump_rt(data, stream):
+    """ Dump data loaded with load_rt to stream """
+    get_rt_yaml().dump(data, stream=stream)
@@ -18,22 +18,16 @@ echo -e "Fetching $PKG medatadata from rdoinfo..."
 PACKAGE_INFO=$(rdopkg findpkg $PKG)
 
 echo -e "Cloning $PKG repo..."
-rm -rf $PKG
-rdopkg clone $PKG >/dev/null 2>&1
+rdo_distgit checkout $PKG $MASTER_RELEASE-rdo $PKG
 if [ $? -ne 0 ]; then
-    echo "ERROR when cloning $PKG"
-    exit 1
-fi
-
-pushd $PKG >/dev/null
-git checkout -b $MASTER_RELEASE-rdo --track origin/$MASTER_RELEASE-rdo>/dev/null 2>&1
-if [ $? -ne 0 ]; then
-    echo "ERROR: branch $MASTER_RELEASE-rdo does not exist in distgit repo"
+    echo "ERROR when cloning $PKG, branch $MASTER_RELEASE-rdo may not exist in distgit repo"
     exit 1
 else
     echo "The branch ${MASTER_RELEASE}-rdo exists in distgit repo"
 fi
 
+pushd $PKG >/dev/null
+
 LAST_NVR=$(echo "$PACKAGE_INFO" | grep cloud9s-openstack-${LATEST_RELEASE}-release|awk '{print $2}')
 LAST_VERSION=$(echo -e "$LAST_NVR" | rev | cut -d- -f2 | rev)
 echo -e "The latest NVR in ${LATEST_RELEASE} is:\t $LAST_NVR"
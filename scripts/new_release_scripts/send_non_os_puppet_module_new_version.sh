@@ -20,14 +20,11 @@ echo "Tag in ${LATEST_RELEASE}: $TAG_IN_LATEST_RELEASE"
 TAG_IN_MASTER_RELEASE=$(echo "$PACKAGE_INFO" |grep -A2 ${MASTER_RELEASE_TAG}|grep source-branch|awk '{print $2}')
 echo "Tag in ${MASTER_RELEASE_TAG}: $TAG_IN_MASTER_RELEASE"
 
-rm -rf $PKG
-rdopkg clone $PKG >/dev/null 2>&1
-pushd $PKG >/dev/null 2>&1
-git checkout -b $MASTER_RELEASE-rdo --track origin/$MASTER_RELEASE-rdo>/dev/null 2>&1
-if [ $? -ne 0 ]; then
+if ! rdo_distgit checkout $PKG $MASTER_RELEASE-rdo $PKG >/dev/null 2>&1; then
     echo "ERROR: branch $MASTER_RELEASE-rdo does not exist"
     exit 1
 fi
+pushd $PKG >/dev/null 2>&1
 
 TAG_IN_MASTER_RELEASE=1
 TAG_IN_LATEST_RELEASE=1
@@ -11,6 +11,8 @@ import sys
 import yaml
 
 from re import search
+from rdoutils import cbs_mirror
+from rdoutils import http_cache
 
 if sys.version_info[0] == 3:
     from tempfile import TemporaryDirectory
@@ -86,7 +88,7 @@ def load_uc(release, distro):
     else:
         branch = release
     url = UC.format(branch)
-    uc_file = requests.get(url)
+    uc_file = http_cache.get(url)
     if uc_file.status_code == 404:
         print('The Openstack release "{}" does not exist.'.format(release))
         sys.exit(1)
@@ -302,10 +304,25 @@ def get_packages_provided_by_repos(mod_name, mod_version, provided_uc,
 def list_builds_from_tag(tag, koji_profile):
     """
     Get builds from a Koji tag passed as argument.
-    A Koji profile can also be passed as argument.
+    A Koji profile can also be passed as argument. CBS tags are read from
+    the local mirror of CBS tags, synced incrementally.
     Returns a dictionary (build name, (version, tag))
     """
     builds = {}
+    if koji_profile == 'cbs':
+        try:
+            mirror = cbs_mirror.CBSTagMirror()
+            mirror.sync([tag])
+            tagged = mirror.list_tagged(tag)
+            mirror.close()
+        except Exception as e:
+            print('Error: could not list builds ({})'.format(e))
+            sys.exit(1)
+        for _b in tagged:
+            builds[_b['name']] = {'version': _b['version'],
+                                  'tag': _b['tag_name']}
+        tag_builds[tag] = builds
+        return builds
     try:
         koji_module = koji.get_profile_module(koji_profile)
     except Exception as e:
@@ -460,7 +477,14 @@ if __name__ == '__main__':
                         action='store_true',
                         default=False,
                         help='verbose mode')
+    parser.add_argument('--no-http-cache',
+                        action='store_true',
+                        default=False,
+                        help=('download upper-constraints instead of '
+                              'revalidating the cached copy'))
     args = parser.parse_args()
+    if args.no_http_cache:
+        http_cache.disable()
 
     main(args.release, args.distro, args.repo_url, args.repo, args.repos_dir,
          args.tag, args.koji_profile, args.status, args.verbose,